@@ -0,0 +1 @@
+# Puts backend/ on sys.path, so tests import the packages the same way main.py does
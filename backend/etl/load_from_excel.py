@@ -3,12 +3,18 @@
 etl/load_from_excel.py
 
 Reads data from SHIELD/data.xlsx and upserts into the database schema.
+
+Run from backend/ as a module (python -m etl.load_from_excel), so the shared
+database module is importable, or through run_etl.py, which also creates the schema.
 """
 
+import io
 import pandas as pd
-from sqlalchemy import create_engine, MetaData, Table, text
+from sqlalchemy import MetaData, Table, text
 from sqlalchemy.dialects.sqlite import insert
 import os
+from database import (get_database_url, get_engine as get_database_engine, is_postgres, table_name_for,
+                      bump_data_version)
 
 # ─── CONFIG ────────────────────────────────────────────────────────────────────
 # Correctly calculate paths from this script's location
@@ -18,7 +24,8 @@ INNER_PROJECT_DIR = os.path.abspath(os.path.join(ETL_DIR, '..', '..'))
 # The excel file is in the 'SHIELD' directory
 SHIELD_DIR = os.path.abspath(os.path.join(ETL_DIR, '..', '..', '..', '..'))
 
-DATABASE_URL = f"sqlite:///{os.path.join(INNER_PROJECT_DIR, 'strategic_shield.db')}"
+# SQLite file in the project root unless STRATEGIC_SHIELD_DATABASE_URL points elsewhere
+DATABASE_URL = get_database_url()
 EXCEL_PATH = os.path.join(SHIELD_DIR, 'data.xlsx')
 
 # Correct sheet names from user's Excel file
@@ -28,12 +35,12 @@ SCENARIOS_SHEET = 'TARGET SITE'
 # ────────────────────────────────────────────────────────────────────────────────
 
 def get_engine():
-    return create_engine(DATABASE_URL, future=True)
+    return get_database_engine(DATABASE_URL, must_exist=False)
 
 def upsert_dataframe(df: pd.DataFrame, table_name: str, key_cols: list, engine=None):
     """
     Upsert a DataFrame into table_name using key_cols for ON CONFLICT.
-    (SQLite-only dialect shown)
+    SQLite uses a multi-row INSERT; PostgreSQL bulk loads through COPY (see copy_upsert_postgres).
     """
     if engine is None:
         engine = get_engine()
@@ -43,6 +50,10 @@ def upsert_dataframe(df: pd.DataFrame, table_name: str, key_cols: list, engine=N
         print(f"Skipping upsert for {table_name} as no data was provided.")
         return
 
+    if is_postgres(engine):
+        copy_upsert_postgres(df, table_name, key_cols, engine)
+        return
+
     metadata = MetaData()
     metadata.reflect(bind=engine, only=[table_name])
     table = Table(table_name, metadata, autoload_with=engine)
@@ -62,6 +73,41 @@ def upsert_dataframe(df: pd.DataFrame, table_name: str, key_cols: list, engine=N
     with engine.begin() as conn:
         conn.execute(stmt)
 
+def copy_upsert_postgres(df: pd.DataFrame, table_name: str, key_cols: list, engine):
+    """
+    Streams the DataFrame into a temporary staging table with COPY, then merges it into
+    table_name with a single INSERT ... ON CONFLICT DO UPDATE.
+
+    COPY avoids one round trip (and one parameter set) per row, which dominates the
+    load time of large catalogs.
+    """
+    table = table_name_for(engine, table_name)
+    staging = f"staging_{table}"
+    columns = ", ".join(df.columns)
+    keys = ", ".join(key_cols)
+    updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in df.columns if col not in key_cols)
+    on_conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                f"ON CONFLICT ({keys}) {on_conflict}"
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
 def load_sites(engine):
     try:
         df = pd.read_excel(EXCEL_PATH, sheet_name=SITES_SHEET, dtype={'x_coord': float, 'y_coord': float})
@@ -136,7 +182,11 @@ def load_scenarios_and_targets(engine):
 
         with engine.begin() as conn:
             conn.execute(text("DELETE FROM ScenarioTarget;"))
-            scenario_target_df.to_sql('ScenarioTarget', conn, if_exists='append', index=False)
+            conn.execute(
+                text("INSERT INTO ScenarioTarget (scenario_id, target_id) VALUES (:scenario_id, :target_id)"),
+                [{"scenario_id": int(row.scenario_id), "target_id": int(row.target_id)}
+                 for row in scenario_target_df.itertuples(index=False)]
+            )
             
     except ValueError as e:
         print(f"ERROR: Sheet '{SCENARIOS_SHEET}' not found in {EXCEL_PATH}. Please check the sheet name.")
@@ -156,6 +206,10 @@ def main():
     load_scenarios_and_targets(engine)
     print(f" → Loaded '{SCENARIOS_SHEET}'")
     
+    # Clients drop their cached scenario bundles when the version changes
+    with engine.begin() as conn:
+        bump_data_version(conn)
+
     print("Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+"""
+load_test.py
+
+Asyncio load generator for the Strategic Shield API.
+
+Virtual users replay the requests the frontend sends (the app journey: bundle prefetch,
+cached scenario switches, streamed runs with an optional early accept and the bundle
+refetch after each run), plus a separately weighted mix of raw endpoints the UI no longer
+calls. The load runs against the FastAPI app, either in-process through its ASGI
+interface or over HTTP through a uvicorn server started in this process. The optimizers and the Gurobi environment pool are replaced by a
+deterministic stub, so no Gurobi license is needed, while the database reads and
+allocation writes are real. Unless --database-url is given, a scratch copy of
+strategic_shield.db is used so the real results are left untouched.
+
+Example:
+    python load_test.py --mode uvicorn --users 30 --duration 60 --solve-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Relative frequency of each user journey
+DEFAULT_JOURNEYS = "app=8,raw=2"
+SCENARIOS = ['1', '2', '3', 'robust']
+
+
+# --- Stub solver ---
+
+class StubEnvPool:
+    """
+    Stands in for EnvPool: hands out placeholder environments, with the same
+    limit on concurrent solves, without starting Gurobi.
+    """
+
+    def __init__(self, size=2):
+        self.size = size
+        self.warm_seconds = 0.0
+        self._slots = threading.BoundedSemaphore(size)
+
+    def warm(self):
+        return 0.0
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No stub environment became available.")
+        try:
+            yield None
+        finally:
+            self._slots.release()
+
+    def close(self):
+        pass
+
+
+class StubSolver:
+    """
+    Deterministic replacement for the optimizer modules returned by main.load_solvers().
+
+    get_data() runs the same catalog queries as the real one, with a vectorized
+    distance matrix. A solve blocks its worker thread for solve_seconds, reports two
+    incumbents and returns a fixed allocation derived from the site and type ids, so
+    repeated runs write identical rows. A SolutionPool passed as solution_pool receives
+    that allocation and whether the solve was stopped early.
+    """
+
+    def __init__(self, solve_seconds=0.25):
+        self.solve_seconds = solve_seconds
+
+    def get_data(self, timer=None):
+        import numpy as np
+        import pandas as pd
+        from database import get_engine
+        from optimization.profiling import PhaseTimer
+
+        timer = timer or PhaseTimer()
+        engine = get_engine()
+        with timer.phase("load_data"):
+            sites = pd.read_sql("SELECT * FROM DeploymentSite", engine, index_col='site_id')
+            missiles = pd.read_sql("SELECT * FROM MissileType", engine, index_col='type_id')
+            inventory = pd.read_sql("SELECT * FROM MissileInventory", engine, index_col='type_id')
+            scenarios = pd.read_sql("SELECT * FROM Scenario", engine, index_col='scenario_id')
+            targets = pd.read_sql("SELECT * FROM Target", engine, index_col='target_id')
+            scenario_targets = pd.read_sql("SELECT * FROM ScenarioTarget", engine)
+            missiles = missiles.join(inventory)
+
+        with timer.phase("distances"):
+            lat1 = np.radians(sites['y_coord'].astype(float).to_numpy())[:, None]
+            lon1 = np.radians(sites['x_coord'].astype(float).to_numpy())[:, None]
+            lat2 = np.radians(targets['y_coord'].astype(float).to_numpy())[None, :]
+            lon2 = np.radians(targets['x_coord'].astype(float).to_numpy())[None, :]
+            a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+            distances = pd.DataFrame(6371 * 2 * np.arcsin(np.sqrt(a)), index=sites.index, columns=targets.index)
+        return sites, missiles, scenarios, targets, scenario_targets, distances
+
+    def _solve(self, scenario_id, instance, on_incumbent, stop_event, timer, solution_pool=None):
+        from optimization.profiling import PhaseTimer
+
+        timer = timer or PhaseTimer()
+        site_ids = [int(i) for i, name in zip(instance.site_ids, instance.site_names)
+                    if scenario_id not in (0, 3) or 'qatar' not in str(name).lower()]
+        type_ids = instance.type_ids.tolist()
+
+        allocations = [
+            {
+                "scenario_id": scenario_id,
+                "site_id": i,
+                "type_id": type_ids[(i + scenario_id) % len(type_ids)],
+                "allocated": 1 + i % 3
+            }
+            for i in site_ids
+        ]
+
+        stopped = False
+        with timer.phase("optimize"):
+            for step in (1, 2):
+                # Sleep in slices, so an early accept stops the solve as it would stop Gurobi
+                until = time.perf_counter() + self.solve_seconds / 2
+                while not stopped and time.perf_counter() < until:
+                    stopped = stop_event is not None and stop_event.is_set()
+                    time.sleep(min(0.01, max(0.0, until - time.perf_counter())))
+                if stopped:
+                    break
+                if on_incumbent is not None:
+                    objective = 1000.0 * step
+                    on_incumbent({
+                        "objective": objective,
+                        "bound": 2000.0,
+                        "gap": (2000.0 - objective) / objective,
+                        "elapsed": self.solve_seconds * step / 2,
+                        "solution_count": step,
+                        "allocations": allocations
+                    })
+
+        if solution_pool is not None:
+            solution_pool.solutions = [{"rank": 1, "objective": 1000.0 * (1 if stopped else 2), "allocations": allocations}]
+            solution_pool.stopped_early = stopped
+        return allocations
+
+    def _instance(self, instance, frames):
+        from optimization.problem_instance import ProblemInstance
+
+        if instance is not None:
+            return instance
+        return ProblemInstance.from_frames(*(frames if frames[0] is not None else self.get_data()))
+
+    def run_optimization_for_scenario(self, scenario_id, sites=None, missiles=None, scenarios=None, targets=None,
+                                      scenario_targets=None, distances=None, on_incumbent=None, stop_event=None,
+                                      instance=None, timer=None, solution_pool=None, **options):
+        instance = self._instance(instance, (sites, missiles, scenarios, targets, scenario_targets, distances))
+        return self._solve(scenario_id, instance, on_incumbent, stop_event, timer, solution_pool)
+
+    def run_robust_optimization(self, on_incumbent=None, stop_event=None, instance=None, timer=None,
+                                solution_pool=None, **options):
+        from database import get_engine, replace_allocation
+
+        instance = self._instance(instance, (None,))
+        results = self._solve(0, instance, on_incumbent, stop_event, timer, solution_pool)
+        with get_engine().begin() as conn:
+            replace_allocation(conn, 0, results)
+        return results
+
+
+def install_stub_solver(app_module, solve_seconds, pool_size):
+    """
+    Points the API module at the stub solver and stub environment pool.
+    """
+    stub = StubSolver(solve_seconds)
+    app_module.load_solvers = lambda: (stub, stub)
+    app_module.SOLVER_POOL = StubEnvPool(pool_size)
+    app_module.STARTUP_METRICS["env_pool_size"] = pool_size
+
+
+# --- Clients ---
+
+class InProcessClient:
+    """
+    Calls the ASGI app directly, without sockets.
+
+    Both clients pass each body chunk to on_chunk as it arrives, so a journey can react
+    to server-sent events while the stream is still open.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, on_chunk=None):
+        url = urlsplit(path)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"loadtest")],
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80)
+        }
+        response = {"status": None, "body": []}
+        finished = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # Streaming responses listen for a disconnect; only report one once they are done
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                if on_chunk is not None and message.get("body"):
+                    on_chunk(message["body"])
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        finished.set()
+        return response["status"], b"".join(response["body"])
+
+
+class HttpClient:
+    """
+    Minimal HTTP/1.1 client on asyncio streams, one connection per request.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def request(self, method, path, on_chunk=None):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(
+                f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Length: 0\r\nConnection: close\r\n\r\n".encode()
+            )
+            await writer.drain()
+
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+            status = int(lines[0].split()[1])
+            headers = {name.strip().lower(): value.strip()
+                       for name, _, value in (line.partition(":") for line in lines[1:])}
+
+            body = []
+            async for chunk in read_body(reader, headers.get("transfer-encoding") == "chunked"):
+                body.append(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+        finally:
+            writer.close()
+        return status, b"".join(body)
+
+
+async def read_body(reader, chunked):
+    """
+    Yields the response body as it arrives, decoding chunked transfer encoding.
+    """
+    if not chunked:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return
+            yield chunk
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            return
+        chunk = await reader.readexactly(size + 2)
+        yield chunk[:size]
+
+
+# --- Statistics ---
+
+class LoadStats:
+    """
+    Latencies and status counts per endpoint label.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, label, seconds, status):
+        self.latencies.setdefault(label, []).append(seconds)
+        counts = self.statuses.setdefault(label, {"2xx": 0, "4xx": 0, "5xx": 0, "failed": 0})
+        if status is None:
+            counts["failed"] += 1
+        elif status < 300:
+            counts["2xx"] += 1
+        elif status < 500:
+            counts["4xx"] += 1
+        else:
+            counts["5xx"] += 1
+
+    def report(self, duration):
+        rows = {}
+        for label in sorted(self.latencies):
+            samples = sorted(self.latencies[label])
+            rows[label] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / duration, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 99) * 1000, 1),
+                "max_ms": round(samples[-1] * 1000, 1),
+                **self.statuses[label]
+            }
+        return rows
+
+
+def percentile(sorted_samples, q):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def print_report(rows, duration, users):
+    print(f"\n--- Load Test Report ({users} users, {duration:.1f}s) ---")
+    header = f"{'endpoint':<42} {'reqs':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'2xx':>5} {'4xx':>5} {'5xx':>5} {'fail':>5}"
+    print(header)
+    print("-" * len(header))
+    for label, row in rows.items():
+        print(f"{label:<42} {row['requests']:>6} {row['throughput_rps']:>7} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+              f"{row['p99_ms']:>8} {row['max_ms']:>8} {row['2xx']:>5} {row['4xx']:>5} {row['5xx']:>5} {row['failed']:>5}")
+    total = sum(row['requests'] for row in rows.values())
+    print(f"\nTotal: {total} requests, {total / duration:.1f} req/s")
+
+
+# --- User journeys ---
+
+async def call(client, stats, method, path, label, on_chunk=None):
+    started = time.perf_counter()
+    try:
+        status, body = await client.request(method, path, on_chunk=on_chunk)
+    except Exception as e:
+        stats.record(label, time.perf_counter() - started, None)
+        print(f"Request {method} {path} failed: {e}")
+        return None, b""
+    stats.record(label, time.perf_counter() - started, status)
+    return status, body
+
+
+class BundleCache:
+    """
+    One browser tab's bundle cache, as kept by getScenarioBundle in api.ts: bundles are
+    served locally until the data version moves, which drops them all.
+    """
+
+    def __init__(self, client, stats):
+        self.client = client
+        self.stats = stats
+        self.bundles = set()
+        self.version = None
+
+    def note_version(self, version):
+        if version != self.version:
+            if self.version is not None:
+                self.bundles.clear()
+            self.version = version
+
+    async def get(self, scenario):
+        if scenario in self.bundles:
+            return
+        status, body = await call(self.client, self.stats, "GET", f"/scenario-bundle/{scenario}",
+                                  "GET /scenario-bundle/{scenario}")
+        if status == 200:
+            self.note_version(json.loads(body)["version"])
+            self.bundles.add(scenario)
+
+
+class EventParser:
+    """
+    Splits a server-sent event stream, fed in arbitrary chunks, into (event, data) pairs.
+    """
+
+    def __init__(self):
+        self.buffer = b""
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        *complete, self.buffer = self.buffer.split(b"\n\n")
+        events = []
+        for raw in complete:
+            fields = dict(line.split(": ", 1) for line in raw.decode().split("\n") if ": " in line)
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields.get("data", "null"))))
+        return events
+
+
+async def streamed_run(client, stats, rng, cache, scenario, accept_rate):
+    """
+    OptimizationPanel: streamOptimization, optionally accepting the first incumbent
+    (acceptIncumbent), then the onDone refetch of the scenario's bundle.
+    """
+    accept = rng.random() < accept_rate
+    parser = EventParser()
+    state = {"solve_id": None, "done": None}
+    accepts = []
+
+    def on_chunk(chunk):
+        for name, data in parser.feed(chunk):
+            if name == "started":
+                state["solve_id"] = data["solve_id"]
+            elif name == "incumbent" and accept and not accepts and state["solve_id"]:
+                accepts.append(asyncio.ensure_future(call(
+                    client, stats, "POST", f"/optimization/stream/{state['solve_id']}/accept",
+                    "POST /optimization/stream/{solve_id}/accept")))
+            elif name == "done":
+                state["done"] = data
+
+    status, _ = await call(client, stats, "GET", f"/optimization/stream/{scenario}",
+                           "GET /optimization/stream/{scenario}", on_chunk=on_chunk)
+    await asyncio.gather(*accepts)
+    if state["done"] is None:
+        if status == 200:
+            print(f"Stream for scenario {scenario} ended without a done event")
+        return
+    cache.note_version(state["done"]["data_version"])
+    await cache.get(scenario)
+
+
+async def app_journey(client, stats, rng, args):
+    """
+    One session in the frontend: App prefetches every bundle, MapView switches scenarios
+    through the bundle cache, and OptimizationPanel runs streamed solves on the selected one.
+    """
+    cache = BundleCache(client, stats)
+    await asyncio.gather(*[cache.get(scenario) for scenario in SCENARIOS])
+    for _ in range(rng.randint(1, 4)):
+        scenario = rng.choice(SCENARIOS)
+        await cache.get(scenario)
+        if rng.random() < args.run_rate:
+            await streamed_run(client, stats, rng, cache, scenario, args.accept_rate)
+        await asyncio.sleep(args.think_ms / 1000 * rng.random())
+
+
+def results_path(scenario):
+    return "/optimization/results/robust" if scenario == 'robust' else f"/optimization/results/{scenario}"
+
+
+async def raw_journey(client, stats, rng, args):
+    """
+    Raw endpoint mix, NOT sent by the current frontend: results, map reads and blocking runs,
+    as older clients and scripts call them.
+    """
+    for _ in range(rng.randint(1, 3)):
+        scenario = rng.choice(SCENARIOS)
+        await call(client, stats, "GET", results_path(scenario), "GET /optimization/results/{scenario}")
+        await call(client, stats, "GET", "/map/deployment-sites", "GET /map/deployment-sites")
+        if scenario == 'robust':
+            await call(client, stats, "GET", "/map/targets/all", "GET /map/targets/all")
+        else:
+            await call(client, stats, "GET", f"/map/targets/{scenario}", "GET /map/targets/{scenario}")
+    if rng.random() < args.run_rate:
+        await call(client, stats, "POST", f"/optimization/run/{scenario}", "POST /optimization/run/{scenario}")
+
+
+JOURNEYS = {
+    "app": app_journey,
+    "raw": raw_journey
+}
+
+
+def parse_journeys(spec):
+    weights = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name not in JOURNEYS:
+            raise ValueError(f"Unknown journey '{name}'. Choose from {sorted(JOURNEYS)}.")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def virtual_user(index, client, stats, weights, deadline, args):
+    rng = random.Random(args.seed + index)
+    await asyncio.sleep(args.ramp_up * rng.random())
+    names = list(weights)
+    while time.perf_counter() < deadline:
+        journey = rng.choices(names, [weights[name] for name in names])[0]
+        await JOURNEYS[journey](client, stats, rng, args)
+        await asyncio.sleep(args.think_ms / 1000 * (0.5 + rng.random()))
+
+
+async def run_load(client, args):
+    stats = LoadStats()
+    weights = parse_journeys(args.journeys)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*[
+        virtual_user(index, client, stats, weights, deadline, args)
+        for index in range(args.users)
+    ])
+    return stats, time.perf_counter() - started
+
+
+# --- Entry point ---
+
+def prepare_database(database_url):
+    """
+    Uses the given database URL, or a scratch copy of the project's SQLite file.
+    """
+    if database_url:
+        os.environ["STRATEGIC_SHIELD_DATABASE_URL"] = database_url
+        return None
+
+    from database import SQLITE_PATH
+    scratch_dir = tempfile.mkdtemp(prefix="shield-load-")
+    scratch_db = os.path.join(scratch_dir, "strategic_shield.db")
+    shutil.copyfile(SQLITE_PATH, scratch_db)
+    os.environ["STRATEGIC_SHIELD_DATABASE_URL"] = f"sqlite:///{scratch_db}"
+    return scratch_dir
+
+
+async def run_in_process(app_module, args):
+    async with app_module.lifespan(app_module.app):
+        return await run_load(InProcessClient(app_module.app), args)
+
+
+def run_with_uvicorn(app_module, args):
+    import uvicorn
+
+    config = uvicorn.Config(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"uvicorn failed to start on port {args.port}")
+        time.sleep(0.05)
+
+    try:
+        return asyncio.run(run_load(HttpClient("127.0.0.1", args.port), args))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Strategic Shield API with a stub solver.")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess",
+                        help="Drive the ASGI app directly or over HTTP through uvicorn.")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for.")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="Seconds over which users start.")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="Mean pause between journeys per user.")
+    parser.add_argument("--solve-ms", type=float, default=250.0, help="Wall time of each stub solve.")
+    parser.add_argument("--pool-size", type=int, default=int(os.environ.get("STRATEGIC_SHIELD_ENV_POOL_SIZE", "2")),
+                        help="Concurrent stub solves, like the Gurobi environment pool.")
+    parser.add_argument("--journeys", default=DEFAULT_JOURNEYS,
+                        help="Journey weights: app (what the frontend sends) and raw (endpoints it no longer calls).")
+    parser.add_argument("--run-rate", type=float, default=0.3, help="Chance that a scenario switch is followed by a run.")
+    parser.add_argument("--accept-rate", type=float, default=0.3,
+                        help="Chance that a streamed run accepts its first incumbent early.")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the users' journey choices.")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --mode uvicorn.")
+    parser.add_argument("--database-url", help="Database to run against (default: scratch copy of the SQLite file).")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    scratch_dir = prepare_database(args.database_url)
+    try:
+        import main as app_module
+        install_stub_solver(app_module, args.solve_ms / 1000, args.pool_size)
+
+        print(f"Load testing ({args.mode}) with {args.users} users for {args.duration:.0f}s...")
+        if args.mode == "inprocess":
+            stats, duration = asyncio.run(run_in_process(app_module, args))
+        else:
+            stats, duration = run_with_uvicorn(app_module, args)
+
+        rows = stats.report(duration)
+        print_report(rows, duration, args.users)
+        if args.json_path:
+            with open(args.json_path, 'w') as f:
+                json.dump({"users": args.users, "duration": duration, "mode": args.mode, "endpoints": rows}, f, indent=2)
+            print(f"Report written to {args.json_path}")
+    finally:
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
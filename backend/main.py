@@ -1,17 +1,269 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 import uvicorn
-import pandas as pd
-from sqlalchemy import create_engine, text
-from optimization.optimizer import run_optimization_for_scenario, get_data
-from optimization.robust_optimizer import run_robust_optimization
+from sqlalchemy import text
+from database import (get_engine, replace_allocation, record_run, ensure_run_table, ensure_allocation_summary,
+                      get_data_version)
+from optimization.env_pool import EnvPool
+from optimization.model_cache import ModelCache, DEFAULT_CACHE_DIR
+from optimization.profiling import PhaseTimer, profile_run
+from optimization.single_flight import SingleFlight, StreamFlight
+import asyncio
+import json
 import os
+import sys
+import threading
+import uuid
+
+# pandas, gurobipy and the optimizer modules are imported lazily (see load_solvers),
+# so the read-only endpoints are served without paying for the solver stack.
+
+# Started Gurobi environments reused by every solve
+SOLVER_POOL = EnvPool(size=int(os.environ.get("STRATEGIC_SHIELD_ENV_POOL_SIZE", "2")))
+
+# Built models on disk, reloaded when a solve runs on unchanged inputs
+MODEL_CACHE = ModelCache(
+    directory=os.environ.get("STRATEGIC_SHIELD_MODEL_CACHE_DIR", DEFAULT_CACHE_DIR),
+    max_bytes=int(os.environ.get("STRATEGIC_SHIELD_MODEL_CACHE_MB", "512")) * 1024 * 1024,
+    max_age_seconds=float(os.environ.get("STRATEGIC_SHIELD_MODEL_CACHE_MAX_AGE_HOURS", "168")) * 3600
+)
+
+# Identical runs in flight at the same time share one solve and one allocation write
+RUNS_IN_FLIGHT = SingleFlight()
+
+# Upper bound on the alternative allocations one run may keep from its solution pool
+MAX_POOL_SIZE = 50
+DEFAULT_POOL_GAP = 0.1
+
+# Identical streamed runs share one solve and its incumbents. Kept apart from RUNS_IN_FLIGHT,
+# since a streaming user may stop the solve early and a blocking caller must not get that result
+STREAMS_IN_FLIGHT = StreamFlight()
+
+# Cold start and first-solve latency, reported by /diagnostics/startup
+STARTUP_METRICS = {
+    "api_ready_seconds": None,
+    "solver_import_seconds": None,
+    "env_pool_warm_seconds": None,
+    "env_pool_size": SOLVER_POOL.size,
+    "first_solve_seconds": None
+}
+
+def load_solvers():
+    """
+    Imports the optimizer modules on first use and returns them.
+    """
+    from optimization import optimizer, robust_optimizer
+    return optimizer, robust_optimizer
+
+def warm_solver_stack():
+    """
+    Imports the solver stack and starts the pooled Gurobi environments in the background.
+    """
+    try:
+        start = time.perf_counter()
+        load_solvers()
+        STARTUP_METRICS["solver_import_seconds"] = time.perf_counter() - start
+        STARTUP_METRICS["env_pool_warm_seconds"] = SOLVER_POOL.warm()
+        print(f"Solver stack warmed: {STARTUP_METRICS}")
+    except Exception as e:
+        # Solves will start environments on demand instead
+        print(f"Could not warm the solver stack: {e}")
+
+def record_solve_latency(started):
+    """
+    Stores the wall time of the first solve served by this process.
+    """
+    if STARTUP_METRICS["first_solve_seconds"] is None:
+        STARTUP_METRICS["first_solve_seconds"] = time.perf_counter() - started
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm in a background thread so the API accepts requests immediately
+    threading.Thread(target=warm_solver_stack, daemon=True).start()
+    STARTUP_METRICS["api_ready_seconds"] = time.perf_counter() - IMPORT_STARTED
+    print(f"API ready in {STARTUP_METRICS['api_ready_seconds']:.3f}s")
+    yield
+    SOLVER_POOL.close()
 
 app = FastAPI(
     title="Strategic Shield API",
     description="API for managing and running missile allocation optimization.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Stop flags for solves currently streaming incumbents, keyed by solve ID
+ACTIVE_SOLVES = {}
+
+def get_db_engine():
+    """
+    Returns the shared engine for the configured database (SQLite file or PostgreSQL),
+    failing if the SQLite database has not been created by the ETL yet.
+    """
+    return get_engine()
+
+def get_allocation_records(engine, scenario_id):
+    """
+    Returns the stored allocation for a scenario, joined with site and missile names.
+    """
+    query = """
+        SELECT
+            a.site_id,
+            ds.name AS site_name,
+            a.type_id,
+            mt.name AS missile_name,
+            a.allocated
+        FROM Allocation a
+        JOIN DeploymentSite ds ON a.site_id = ds.site_id
+        JOIN MissileType mt ON a.type_id = mt.type_id
+        WHERE a.scenario_id = :scenario_id
+        ORDER BY ds.name, mt.name
+    """
+    return fetch_records(engine, query, {"scenario_id": scenario_id})
+
+def get_summary_totals(engine, scenario_id):
+    """
+    Returns the stored scenario totals of a scenario's allocation, or None if the scenario
+    has no stored allocation. A missing summary of stored rows is rebuilt first.
+    """
+    query = "SELECT * FROM AllocationScenarioSummary WHERE scenario_id = :scenario_id"
+    totals = fetch_records(engine, query, {"scenario_id": scenario_id}) if ensure_allocation_summary(engine, scenario_id) else []
+    return totals[0] if totals else None
+
+def get_summary_records(engine, scenario_id):
+    """
+    Returns the stored rollups of a scenario's allocation: scenario totals plus one record
+    per site and per missile type, or None if the scenario has no stored allocation.
+    """
+    totals = get_summary_totals(engine, scenario_id)
+    if totals is None:
+        return None
+
+    sites = fetch_records(engine, """
+        SELECT s.site_id, ds.name AS site_name, s.total_allocated, s.types_used, s.capacity, s.capacity_utilization
+        FROM AllocationSiteSummary s
+        JOIN DeploymentSite ds ON s.site_id = ds.site_id
+        WHERE s.scenario_id = :scenario_id
+        ORDER BY ds.name
+    """, {"scenario_id": scenario_id})
+    types = fetch_records(engine, """
+        SELECT s.type_id, mt.name AS missile_name, s.total_allocated, s.sites_used, s.total_stock, s.stock_utilization
+        FROM AllocationTypeSummary s
+        JOIN MissileType mt ON s.type_id = mt.type_id
+        WHERE s.scenario_id = :scenario_id
+        ORDER BY mt.name
+    """, {"scenario_id": scenario_id})
+    return {**totals, "sites": sites, "types": types}
+
+def get_site_records(engine):
+    """
+    Returns all deployment sites with coordinates and the Qatar flag used by the map.
+    """
+    sites = fetch_records(engine, "SELECT site_id, name, x_coord, y_coord, priority, capacity FROM DeploymentSite")
+
+    # Add Qatar status for frontend visualization
+    for site in sites:
+        site['is_qatar'] = 'qatar' in site['name'].lower()
+    return sites
+
+def get_target_records(engine, scenario_id=None):
+    """
+    Returns the targets of a scenario, or every target when scenario_id is None.
+    """
+    if scenario_id is None:
+        return fetch_records(engine, "SELECT target_id, name, x_coord, y_coord, priority FROM Target")
+
+    query = """
+        SELECT t.target_id, t.name, t.x_coord, t.y_coord, t.priority
+        FROM Target t
+        JOIN ScenarioTarget st ON t.target_id = st.target_id
+        WHERE st.scenario_id = :scenario_id
+    """
+    return fetch_records(engine, query, {"scenario_id": scenario_id})
+
+def fetch_records(engine, query, params=None):
+    """
+    Runs a read-only query and returns its rows as JSON-ready dicts.
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text(query), params or {}).mappings().all()
+
+    records = [dict(row) for row in rows]
+    # Convert Decimal coordinates to float for JSON serialization
+    for record in records:
+        for column in ('x_coord', 'y_coord'):
+            if column in record:
+                record[column] = float(record[column])
+    return records
+
+def save_scenario_results(scenario_id, results):
+    """
+    Replaces the stored allocation for a scenario with the given results.
+    """
+    print("Saving allocation results to the database...")
+
+    # Connect to the database
+    engine = get_db_engine()
+
+    # Clear old results for this scenario and save new ones
+    with engine.begin() as conn:
+        replace_allocation(conn, scenario_id, results)
+
+    print("Successfully saved results.")
+
+def coalescing_key(scenario_id, instance, pool_size=1, pool_gap=DEFAULT_POOL_GAP):
+    """
+    Key under which identical runs share a solve: the scenario (or 'robust'), the input
+    fingerprint and the solution pool settings. Blocking runs coalesce in RUNS_IN_FLIGHT and
+    streamed runs in STREAMS_IN_FLIGHT, so the two kinds never share a solve.
+    """
+    return ('robust' if scenario_id == 0 else scenario_id, instance.fingerprint(), pool_size, pool_gap)
+
+def run_coalesced(key, solve, timer):
+    """
+    Runs solve() unless an identical run (same scenario and input fingerprint) is in flight,
+    in which case it waits for that run and returns its results instead.
+
+    Returns (results, coalesced). Time spent waiting on another request's solve is
+    recorded as the in_flight_wait phase.
+    """
+    started = time.perf_counter()
+    results, coalesced = RUNS_IN_FLIGHT.do(key, solve)
+    if coalesced:
+        timer.add("in_flight_wait", time.perf_counter() - started)
+        print(f"Run {key[0]} joined an identical solve already in flight.")
+    return results, coalesced
+
+def run_stream_coalesced(key, subscriber_id, publish, stop_event, solve, timer):
+    """
+    Streamed counterpart of run_coalesced: solve(fanout) runs unless an identical streamed
+    run is in flight, in which case this run receives that solve's incumbents and result.
+    """
+    started = time.perf_counter()
+    results, coalesced = STREAMS_IN_FLIGHT.do(key, subscriber_id, publish, stop_event, solve)
+    if coalesced:
+        timer.add("in_flight_wait", time.perf_counter() - started)
+        print(f"Streamed run {key[0]} joined an identical streamed solve already in flight.")
+    return results, coalesced
+
+def check_pool_settings(pool_size, pool_gap):
+    """
+    Rejects solution pool settings outside what a single request may ask for.
+    """
+    if not 1 <= pool_size <= MAX_POOL_SIZE:
+        raise HTTPException(status_code=422, detail=f"pool_size must be between 1 and {MAX_POOL_SIZE}.")
+    if pool_gap < 0:
+        raise HTTPException(status_code=422, detail="pool_gap must not be negative.")
+
+def run_status(results, coalesced):
+    if not results:
+        return "failed"
+    return "coalesced" if coalesced else "success"
+
 @app.get("/")
 def read_root():
     """
@@ -19,23 +271,73 @@ def read_root():
     """
     return {"message": "Welcome to the Strategic Shield API"}
 
+@app.get("/diagnostics/startup")
+def get_startup_metrics():
+    """
+    Reports cold start timings: time until the API was ready, solver import and
+    Gurobi environment warm-up in the background, and the latency of the first solve.
+    """
+    return {**STARTUP_METRICS, "solver_stack_loaded": "gurobipy" in sys.modules}
+
 @app.post("/optimization/run/robust")
-def run_robust_optimization_endpoint():
+def run_robust_optimization_endpoint(profile: bool = False, pool_size: int = 1, pool_gap: float = DEFAULT_POOL_GAP):
     """
     Triggers the robust optimization model that considers all scenarios with realistic probabilities.
     
     This creates a single allocation that performs well across all potential conflicts.
     Uses probabilities: Greece-Bulgaria (0.20), Armenia-Russia (0.35), Israel-US (0.45)
+    With ?profile=1 the request is profiled and the report path is returned.
+    With pool_size > 1 up to that many distinct allocations within pool_gap of the best are
+    stored under the run; page through them with GET /optimization/runs/{run_key}/solutions.
+    Concurrent requests on the same data share a single solve (see run_coalesced).
     """
+    check_pool_settings(pool_size, pool_gap)
     try:
-        # Run the robust optimization
-        results = run_robust_optimization()
+        optimizer, robust_optimizer = load_solvers()
+        from optimization.problem_instance import ProblemInstance
+        from optimization.solution_pool import SolutionPool
+
+        run_key = uuid.uuid4().hex
+        timer = PhaseTimer()
+
+        with profile_run(f"robust_{run_key}", enabled=profile) as report:
+            frames = optimizer.get_data(timer=timer)
+            with timer.phase("prepare_instance"):
+                instance = ProblemInstance.from_frames(*frames)
+
+            def solve():
+                # Run the robust optimization on a pooled environment (it saves its own results)
+                started = time.perf_counter()
+                pool = SolutionPool(pool_size, pool_gap)
+                timer.start("acquire_env")
+                with SOLVER_POOL.acquire() as env:
+                    timer.stop("acquire_env")
+                    results = robust_optimizer.run_robust_optimization(instance=instance, env=env,
+                                                                       model_cache=MODEL_CACHE, timer=timer,
+                                                                       solution_pool=pool)
+                record_solve_latency(started)
+                return results, pool.solutions
+
+            (results, solutions), coalesced = run_coalesced(
+                coalescing_key(0, instance, pool_size, pool_gap), solve, timer)
+
+        timings = timer.as_dict()
+        engine = get_db_engine()
+        record_run(engine, run_key, 0, run_status(results, coalesced), len(results or []), timings,
+                   solutions=solutions)
 
         if results:
             return {
                 "status": "success", 
                 "message": "Robust optimization completed successfully.", 
                 "allocations_found": len(results),
+                "results": get_allocation_records(engine, 0),
+                "data_version": get_data_version(engine),
+                "run_key": run_key,
+                "coalesced": coalesced,
+                "solutions": len(solutions),
+                "timings": timings,
+                "profile": report.get("path"),
                 "note": "This allocation is optimized for all scenarios with realistic probabilities",
                 "probabilities": {
                     "Greece-Bulgaria Coalition": 0.20,
@@ -50,102 +352,107 @@ def run_robust_optimization_endpoint():
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
 @app.get("/optimization/results/robust")
-def get_robust_optimization_results():
+def get_robust_optimization_results(include_results: bool = True):
     """
     Retrieves the stored robust optimization results.
     
     Returns the single allocation that works best across all scenarios.
+    The totals come from the allocation summary; with ?include_results=false only they
+    are returned, without joining the allocation rows with site and missile names.
     """
     try:
-        # --- Database Connection ---
-        OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-        PROJECT_ROOT = os.path.dirname(OPTIMIZER_DIR)
-        DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-        
-        if not os.path.exists(DB_PATH):
-            raise FileNotFoundError("Database file not found. Please run the ETL script first.")
-
-        engine = create_engine(f"sqlite:///{DB_PATH}")
+        engine = get_db_engine()
+        totals = get_summary_totals(engine, 0)
 
-        # --- Query Data ---
-        query = """
-            SELECT
-                a.site_id,
-                ds.name AS site_name,
-                a.type_id,
-                mt.name AS missile_name,
-                a.allocated
-            FROM Allocation a
-            JOIN DeploymentSite ds ON a.site_id = ds.site_id
-            JOIN MissileType mt ON a.type_id = mt.type_id
-            WHERE a.scenario_id = 0
-            ORDER BY ds.name, mt.name
-        """
-        results_df = pd.read_sql(query, engine)
-
-        if results_df.empty:
+        if totals is None:
             raise HTTPException(status_code=404, detail="No robust optimization results found. Please run the robust optimization first.")
 
-        # Convert numpy types to native Python types for JSON serialization
-        results_list = []
-        for _, row in results_df.iterrows():
-            results_list.append({
-                "site_id": int(row['site_id']),
-                "site_name": str(row['site_name']),
-                "type_id": int(row['type_id']),
-                "missile_name": str(row['missile_name']),
-                "allocated": int(row['allocated'])
-            })
-
-        return {
-            "results": results_list,
-            "total_allocations": len(results_list),
-            "total_missiles": int(results_df['allocated'].sum()),
+        response = {
+            "total_allocations": totals["allocation_count"],
+            "total_missiles": totals["total_missiles"],
             "note": "This is the robust allocation optimized for all scenarios with realistic probabilities"
         }
+        if include_results:
+            response["results"] = get_allocation_records(engine, 0)
+        return response
 
+    except HTTPException:
+        raise
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
 @app.post("/optimization/run/{scenario_id}")
-def run_optimization(scenario_id: int):
+def run_optimization(scenario_id: int, profile: bool = False, pool_size: int = 1, pool_gap: float = DEFAULT_POOL_GAP):
     """
     Triggers the optimization model for a given scenario ID.
     
     This will execute the Gurobi solver and save the results to the database.
+    The response carries per-phase timings; with ?profile=1 the request is also profiled.
+    pool_size and pool_gap request alternative allocations, as for the robust run.
+    Concurrent requests for the same scenario and data share a single solve and write.
     """
+    check_pool_settings(pool_size, pool_gap)
     try:
-        # Load the latest data from the database
-        sites, missiles, scenarios, targets, scenario_targets, distances = get_data()
-
-        # Check if the scenario exists
-        if scenario_id not in scenarios.index:
-            raise HTTPException(status_code=404, detail=f"Scenario with ID {scenario_id} not found.")
-
-        # Run the optimization
-        results = run_optimization_for_scenario(scenario_id, sites, missiles, scenarios, targets, scenario_targets, distances)
+        optimizer, _ = load_solvers()
+        from optimization.problem_instance import ProblemInstance
+        from optimization.solution_pool import SolutionPool
+
+        run_key = uuid.uuid4().hex
+        timer = PhaseTimer()
+
+        with profile_run(f"scenario_{scenario_id}_{run_key}", enabled=profile) as report:
+            # Load the latest data from the database
+            sites, missiles, scenarios, targets, scenario_targets, distances = optimizer.get_data(timer=timer)
+
+            # Check if the scenario exists
+            if scenario_id not in scenarios.index:
+                raise HTTPException(status_code=404, detail=f"Scenario with ID {scenario_id} not found.")
+
+            with timer.phase("prepare_instance"):
+                instance = ProblemInstance.from_frames(sites, missiles, scenarios, targets, scenario_targets, distances)
+
+            def solve():
+                # Run the optimization on a pooled environment
+                started = time.perf_counter()
+                pool = SolutionPool(pool_size, pool_gap)
+                timer.start("acquire_env")
+                with SOLVER_POOL.acquire() as env:
+                    timer.stop("acquire_env")
+                    results = optimizer.run_optimization_for_scenario(scenario_id, instance=instance, env=env,
+                                                                      model_cache=MODEL_CACHE, timer=timer,
+                                                                      solution_pool=pool)
+                record_solve_latency(started)
+
+                if results:
+                    # --- Save results to the database ---
+                    with timer.phase("save_results"):
+                        save_scenario_results(scenario_id, results)
+                return results, pool.solutions
+
+            (results, solutions), coalesced = run_coalesced(
+                coalescing_key(scenario_id, instance, pool_size, pool_gap), solve, timer)
+
+        timings = timer.as_dict()
+        engine = get_db_engine()
+        record_run(engine, run_key, scenario_id, run_status(results, coalesced), len(results or []), timings,
+                   solutions=solutions)
 
         if results:
-            # --- Save results to the database ---
-            print("Saving allocation results to the database...")
-            results_df = pd.DataFrame(results)
-            
-            # Connect to the database
-            OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-            PROJECT_ROOT = os.path.dirname(OPTIMIZER_DIR)
-            DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-            engine = create_engine(f"sqlite:///{DB_PATH}")
-
-            # Clear old results for this scenario and save new ones
-            with engine.begin() as conn:
-                conn.execute(text(f"DELETE FROM Allocation WHERE scenario_id = {scenario_id}"))
-                results_df.to_sql('Allocation', conn, if_exists='append', index=False)
-            
-            print("Successfully saved results.")
-            
-            return {"status": "success", "message": f"Optimization for scenario {scenario_id} completed successfully.", "allocations_found": len(results)}
+            # Return the stored allocation so clients don't need a follow-up GET
+            return {
+                "status": "success",
+                "message": f"Optimization for scenario {scenario_id} completed successfully.",
+                "allocations_found": len(results),
+                "results": get_allocation_records(engine, scenario_id),
+                "data_version": get_data_version(engine),
+                "run_key": run_key,
+                "coalesced": coalesced,
+                "solutions": len(solutions),
+                "timings": timings,
+                "profile": report.get("path")
+            }
         else:
             raise HTTPException(status_code=500, detail="Optimization failed to find a solution.")
 
@@ -154,6 +461,283 @@ def run_optimization(scenario_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
+@app.post("/optimization/lns/{scenario}")
+def run_lns_optimization(scenario: str, sites: str = "", targets: str = "", time_budget: float = 5.0,
+                         neighborhood_size: int = 4):
+    """
+    Locally re-optimizes the stored allocation of a scenario ID (or 'robust') after a small data change.
+
+    sites and targets are comma-separated IDs of the changed deployment sites and targets.
+    Only the sites around the change are re-solved; all other sites keep their stored
+    allocation unless a later neighborhood improves them within time_budget seconds.
+    """
+    if scenario != 'robust' and not scenario.isdigit():
+        raise HTTPException(status_code=404, detail=f"Scenario '{scenario}' not found.")
+    scenario_id = 0 if scenario == 'robust' else int(scenario)
+
+    try:
+        changed_site_ids = [int(i) for i in sites.split(",") if i.strip()]
+        changed_target_ids = [int(t) for t in targets.split(",") if t.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="sites and targets must be comma-separated integer IDs.")
+
+    try:
+        optimizer, _ = load_solvers()
+        from optimization import lns
+        from optimization.problem_instance import ProblemInstance
+
+        engine = get_db_engine()
+        stored = get_allocation_records(engine, scenario_id)
+        if not stored:
+            raise HTTPException(status_code=404, detail=f"No stored allocation for scenario {scenario}. Run the full optimization first.")
+        previous = {(r["site_id"], r["type_id"]): r["allocated"] for r in stored}
+
+        run_key = uuid.uuid4().hex
+        timer = PhaseTimer()
+        frames = optimizer.get_data(timer=timer)
+        if scenario_id != 0 and scenario_id not in frames[2].index:
+            raise HTTPException(status_code=404, detail=f"Scenario with ID {scenario_id} not found.")
+        with timer.phase("prepare_instance"):
+            instance = ProblemInstance.from_frames(*frames)
+
+        with SOLVER_POOL.acquire() as env:
+            outcome = lns.run_lns(scenario_id, instance, previous, changed_site_ids, changed_target_ids,
+                                  time_budget=time_budget, neighborhood_size=neighborhood_size,
+                                  env=env, model_cache=MODEL_CACHE, timer=timer)
+
+        if outcome is not None:
+            with timer.phase("save_results"):
+                save_scenario_results(scenario_id, outcome["allocations"])
+
+        timings = timer.as_dict()
+        record_run(engine, run_key, scenario_id, "success" if outcome else "failed",
+                   len(outcome["allocations"]) if outcome else 0, timings)
+
+        if outcome is None:
+            raise HTTPException(status_code=500, detail="Local re-optimization found no feasible allocation.")
+
+        return {
+            "status": "success",
+            "message": f"Local re-optimization for scenario {scenario} completed successfully.",
+            "allocations_found": len(outcome["allocations"]),
+            "objective": outcome["objective"],
+            "changed_cells": outcome["changed_cells"],
+            "iterations": outcome["iterations"],
+            "results": get_allocation_records(engine, scenario_id),
+            "data_version": get_data_version(engine),
+            "run_key": run_key,
+            "timings": timings
+        }
+
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+def run_streamed_solve(scenario, publish, stop_event, run_key):
+    """
+    Runs a solve in a worker thread, publishing incumbents and a final status event.
+    The run's metadata and timings are stored under run_key.
+
+    A streamed run on the same scenario and data as another streamed run already in flight
+    joins that solve instead of starting a second one: it receives the shared solve's
+    incumbents from then on, and accepting early stops the shared solve. Blocking runs
+    never join a streamed solve, nor streamed runs a blocking one.
+    """
+    try:
+        optimizer, robust_optimizer = load_solvers()
+        from optimization.problem_instance import ProblemInstance
+        from optimization.solution_pool import SolutionPool
+
+        timer = PhaseTimer()
+        scenario_id = 0 if scenario == 'robust' else int(scenario)
+        frames = optimizer.get_data(timer=timer)
+        if scenario_id != 0 and scenario_id not in frames[2].index:
+            publish({"event": "error", "detail": f"Scenario with ID {scenario_id} not found."})
+            return
+        with timer.phase("prepare_instance"):
+            instance = ProblemInstance.from_frames(*frames)
+
+        def solve(fanout):
+            started = time.perf_counter()
+            pool = SolutionPool(1, DEFAULT_POOL_GAP)
+            timer.start("acquire_env")
+            with SOLVER_POOL.acquire() as env:
+                timer.stop("acquire_env")
+                # The fanout relays incumbents to every joined stream and stops on any acceptance
+                if scenario_id == 0:
+                    results = robust_optimizer.run_robust_optimization(on_incumbent=fanout.publish, stop_event=fanout,
+                                                                       instance=instance, env=env,
+                                                                       model_cache=MODEL_CACHE, timer=timer,
+                                                                       solution_pool=pool)
+                else:
+                    results = optimizer.run_optimization_for_scenario(scenario_id, instance=instance,
+                                                                      on_incumbent=fanout.publish,
+                                                                      stop_event=fanout, env=env,
+                                                                      model_cache=MODEL_CACHE, timer=timer,
+                                                                      solution_pool=pool)
+                    if results:
+                        with timer.phase("save_results"):
+                            save_scenario_results(scenario_id, results)
+            record_solve_latency(started)
+            # Whether the solver really stopped early, not whether someone asked it to
+            return results, pool.solutions, pool.stopped_early
+
+        (results, solutions, accepted_early), coalesced = run_stream_coalesced(
+            coalescing_key(scenario_id, instance), run_key, publish, stop_event, solve, timer)
+
+        timings = timer.as_dict()
+        engine = get_db_engine()
+        record_run(engine, run_key, scenario_id, run_status(results, coalesced), len(results or []), timings,
+                   solutions=solutions)
+
+        if results:
+            publish({
+                "event": "done",
+                "accepted_early": accepted_early,
+                "allocations_found": len(results),
+                "data_version": get_data_version(engine),
+                "run_key": run_key,
+                "coalesced": coalesced,
+                "timings": timings
+            })
+        else:
+            publish({"event": "error", "detail": "Optimization failed to find a solution."})
+    except Exception as e:
+        publish({"event": "error", "detail": f"An unexpected error occurred: {e}"})
+
+@app.get("/optimization/stream/{scenario}")
+async def stream_optimization(scenario: str):
+    """
+    Runs the optimization for a scenario ID (or 'robust') and streams progress as Server-Sent Events.
+
+    Emits a 'started' event carrying the solve ID, an 'incumbent' event with the allocation,
+    objective, bound and gap each time the solver finds a better solution, and finally
+    'done' or 'error'. POST /optimization/stream/{solve_id}/accept stops the solve early
+    and keeps the latest incumbent.
+    """
+    if scenario != 'robust' and not scenario.isdigit():
+        raise HTTPException(status_code=404, detail=f"Scenario '{scenario}' not found.")
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    solve_id = uuid.uuid4().hex
+    stop_event = threading.Event()
+    ACTIVE_SOLVES[solve_id] = stop_event
+
+    def publish(event):
+        # Callbacks fire on the solver thread; hand events over to the event loop
+        if "event" not in event:
+            event = {"event": "incumbent", **event}
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def solve():
+        try:
+            run_streamed_solve(scenario, publish, stop_event, solve_id)
+        finally:
+            ACTIVE_SOLVES.pop(solve_id, None)
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    async def event_stream():
+        yield f"event: started\ndata: {json.dumps({'solve_id': solve_id, 'scenario': scenario})}\n\n"
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+    loop.run_in_executor(None, solve)
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/optimization/stream/{solve_id}/accept")
+def accept_incumbent(solve_id: str):
+    """
+    Accepts the current incumbent of a streaming solve, stopping the solver early.
+    """
+    stop_event = ACTIVE_SOLVES.get(solve_id)
+    if stop_event is None:
+        raise HTTPException(status_code=404, detail=f"No running solve with ID {solve_id}.")
+    stop_event.set()
+    return {"status": "accepted", "solve_id": solve_id}
+
+@app.get("/optimization/runs/{run_key}")
+def get_optimization_run(run_key: str):
+    """
+    Returns the stored metadata of one optimization run, including its per-phase timings.
+    """
+    try:
+        engine = get_db_engine()
+        ensure_run_table(engine)
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT * FROM OptimizationRun WHERE run_key = :run_key"),
+                               {"run_key": run_key}).mappings().first()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"No optimization run with key {run_key}.")
+    return {**dict(row), "timings": json.loads(row["timings"])}
+
+@app.get("/optimization/runs/{run_key}/solutions")
+def get_optimization_run_solutions(run_key: str, offset: int = 0, limit: int = 5):
+    """
+    Pages through the alternative allocations stored for a run, best objective first.
+
+    Each solution carries its rank (1 = best), objective and allocation joined with
+    site and missile names. Runs started without pool_size > 1 store a single solution.
+    """
+    if offset < 0 or not 1 <= limit <= MAX_POOL_SIZE:
+        raise HTTPException(status_code=422, detail=f"offset must be >= 0 and limit between 1 and {MAX_POOL_SIZE}.")
+
+    try:
+        engine = get_db_engine()
+        ensure_run_table(engine)
+        with engine.connect() as conn:
+            run_exists = conn.execute(text("SELECT 1 FROM OptimizationRun WHERE run_key = :run_key"),
+                                      {"run_key": run_key}).first()
+            total = conn.execute(text("SELECT COUNT(*) FROM RunSolution WHERE run_key = :run_key"),
+                                 {"run_key": run_key}).scalar()
+            page = conn.execute(text(
+                "SELECT rank, objective FROM RunSolution WHERE run_key = :run_key "
+                "ORDER BY rank LIMIT :limit OFFSET :offset"
+            ), {"run_key": run_key, "limit": limit, "offset": offset}).mappings().all()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if run_exists is None:
+        raise HTTPException(status_code=404, detail=f"No optimization run with key {run_key}.")
+
+    solutions = {row["rank"]: {"rank": row["rank"], "objective": row["objective"], "allocations": []} for row in page}
+    if solutions:
+        query = """
+            SELECT
+                rsa.rank,
+                rsa.site_id,
+                ds.name AS site_name,
+                rsa.type_id,
+                mt.name AS missile_name,
+                rsa.allocated
+            FROM RunSolutionAllocation rsa
+            JOIN DeploymentSite ds ON rsa.site_id = ds.site_id
+            JOIN MissileType mt ON rsa.type_id = mt.type_id
+            WHERE rsa.run_key = :run_key AND rsa.rank BETWEEN :first AND :last
+            ORDER BY rsa.rank, ds.name, mt.name
+        """
+        for record in fetch_records(engine, query, {"run_key": run_key, "first": min(solutions), "last": max(solutions)}):
+            solutions[record.pop("rank")]["allocations"].append(record)
+
+    return {
+        "run_key": run_key,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "solutions": list(solutions.values())
+    }
+
 @app.get("/optimization/results/{scenario_id}")
 def get_optimization_results(scenario_id: int):
     """
@@ -162,66 +746,52 @@ def get_optimization_results(scenario_id: int):
     The results are joined with site and missile names for clarity.
     """
     try:
-        # --- Database Connection ---
-        OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-        PROJECT_ROOT = os.path.dirname(OPTIMIZER_DIR)
-        DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-        
-        if not os.path.exists(DB_PATH):
-            raise FileNotFoundError("Database file not found. Please run the ETL script first.")
-
-        engine = create_engine(f"sqlite:///{DB_PATH}")
-
-        # --- Query Data ---
-        query = f"""
-            SELECT
-                a.site_id,
-                ds.name AS site_name,
-                a.type_id,
-                mt.name AS missile_name,
-                a.allocated
-            FROM Allocation a
-            JOIN DeploymentSite ds ON a.site_id = ds.site_id
-            JOIN MissileType mt ON a.type_id = mt.type_id
-            WHERE a.scenario_id = {scenario_id}
-        """
-        results_df = pd.read_sql(query, engine)
+        engine = get_db_engine()
+        results = get_allocation_records(engine, scenario_id)
 
-        if results_df.empty:
+        if not results:
             raise HTTPException(status_code=404, detail=f"No allocation results found for scenario ID {scenario_id}. Please run the optimization first.")
 
-        return results_df.to_dict(orient="records")
+        return results
 
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
+@app.get("/optimization/summary/{scenario}")
+def get_optimization_summary(scenario: str):
+    """
+    Returns the totals of the stored allocation of a scenario ID (or 'robust'):
+    missiles deployed, sites and types used, and capacity / stock utilization overall,
+    per site and per missile type.
+
+    The rollups are written together with the allocation, so this reads them directly
+    instead of aggregating the allocation rows.
+    """
+    if scenario != 'robust' and not scenario.isdigit():
+        raise HTTPException(status_code=404, detail=f"Scenario '{scenario}' not found.")
+
+    try:
+        engine = get_db_engine()
+        summary = get_summary_records(engine, 0 if scenario == 'robust' else int(scenario))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No allocation results found for scenario {scenario}. Please run the optimization first.")
+    return summary
+
 @app.get("/map/deployment-sites")
 def get_deployment_sites():
     """
     Returns a list of all deployment sites with their coordinates for map visualization.
     """
     try:
-        OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-        PROJECT_ROOT = os.path.dirname(OPTIMIZER_DIR)
-        DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-        
-        if not os.path.exists(DB_PATH):
-            raise FileNotFoundError("Database file not found. Please run the ETL script first.")
-
-        engine = create_engine(f"sqlite:///{DB_PATH}")
-        query = "SELECT site_id, name, x_coord, y_coord, priority, capacity FROM DeploymentSite"
-        df = pd.read_sql(query, engine)
-        
-        # Convert Decimal types to float for JSON serialization
-        df['x_coord'] = df['x_coord'].astype(float)
-        df['y_coord'] = df['y_coord'].astype(float)
-        
-        # Add Qatar status for frontend visualization
-        df['is_qatar'] = df['name'].str.contains('Qatar', case=False, na=False)
-        
-        return df.to_dict(orient="records")
+        engine = get_db_engine()
+        return get_site_records(engine)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
@@ -231,32 +801,8 @@ def get_all_targets():
     Returns a list of ALL targets from ALL scenarios for robust optimization map visualization.
     """
     try:
-        OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-        PROJECT_ROOT = os.path.dirname(OPTIMIZER_DIR)
-        DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-        
-        if not os.path.exists(DB_PATH):
-            raise FileNotFoundError("Database file not found. Please run the ETL script first.")
-
-        engine = create_engine(f"sqlite:///{DB_PATH}")
-        query = """
-            SELECT DISTINCT
-                t.target_id,
-                t.name,
-                t.x_coord,
-                t.y_coord,
-                t.priority
-            FROM Target t
-        """
-        df = pd.read_sql(query, engine)
-        if df.empty:
-            return []
-            
-        # Convert Decimal types to float for JSON serialization
-        df['x_coord'] = df['x_coord'].astype(float)
-        df['y_coord'] = df['y_coord'].astype(float)
-        
-        return df.to_dict(orient="records")
+        engine = get_db_engine()
+        return get_target_records(engine)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
@@ -266,34 +812,36 @@ def get_scenario_targets(scenario_id: int):
     Returns a list of targets for a specific scenario with their coordinates for map visualization.
     """
     try:
-        OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-        PROJECT_ROOT = os.path.dirname(OPTIMIZER_DIR)
-        DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-        
-        if not os.path.exists(DB_PATH):
-            raise FileNotFoundError("Database file not found. Please run the ETL script first.")
-
-        engine = create_engine(f"sqlite:///{DB_PATH}")
-        query = f"""
-            SELECT
-                t.target_id,
-                t.name,
-                t.x_coord,
-                t.y_coord,
-                t.priority
-            FROM Target t
-            JOIN ScenarioTarget st ON t.target_id = st.target_id
-            WHERE st.scenario_id = {scenario_id}
-        """
-        df = pd.read_sql(query, engine)
-        if df.empty:
-            return []
-            
-        # Convert Decimal types to float for JSON serialization
-        df['x_coord'] = df['x_coord'].astype(float)
-        df['y_coord'] = df['y_coord'].astype(float)
-        
-        return df.to_dict(orient="records")
+        engine = get_db_engine()
+        return get_target_records(engine, scenario_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/scenario-bundle/{scenario}")
+def get_scenario_bundle(scenario: str):
+    """
+    Returns everything the map and results views need for a scenario in one versioned payload.
+
+    The bundle holds the deployment sites, the scenario's targets (all targets for 'robust')
+    and the latest stored allocation. 'version' changes whenever any of them change, so
+    clients can cache bundles and only refetch after the data version moves.
+    """
+    if scenario != 'robust' and not scenario.isdigit():
+        raise HTTPException(status_code=404, detail=f"Scenario '{scenario}' not found.")
+
+    try:
+        engine = get_db_engine()
+        scenario_id = 0 if scenario == 'robust' else int(scenario)
+
+        return {
+            "version": get_data_version(engine),
+            "scenario": scenario,
+            "sites": get_site_records(engine),
+            "targets": get_target_records(engine, None if scenario == 'robust' else scenario_id),
+            "allocation": get_allocation_records(engine, scenario_id)
+        }
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
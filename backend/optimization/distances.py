@@ -0,0 +1,158 @@
+import os
+import tempfile
+import weakref
+import numpy as np
+import pandas as pd
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Calculate the distance between two points on Earth in kilometers.
+    Works element-wise on NumPy arrays, so broadcasting a column of sites against a
+    row of targets yields a whole block of the distance matrix.
+    """
+    R = 6371  # Radius of Earth in kilometers
+
+    lat1_rad = np.radians(lat1)
+    lon1_rad = np.radians(lon1)
+    lat2_rad = np.radians(lat2)
+    lon2_rad = np.radians(lon2)
+
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+
+    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c
+
+
+class ChunkedDistances:
+    """
+    Site x target distances held in a disk-backed np.memmap, plus the sparse
+    reachability structure: the (site, target) pairs within the longest missile range.
+
+    matrix rows and columns follow site_ids and target_ids, i.e. the order of the
+    DataFrames passed to compute_distances_chunked, so ProblemInstance.from_frames can
+    use it without copying. Pairs are stored as positions into site_ids / target_ids.
+
+    A temp file created by compute_distances_chunked is deleted by close(), on leaving a
+    with-block, or at the latest when the object is garbage collected; a file at a path
+    chosen by the caller is left in place. On POSIX systems a ProblemInstance that still
+    maps the matrix keeps working after the file is deleted.
+    """
+
+    def __init__(self, matrix, site_ids, target_ids, pair_sites, pair_targets, pair_distances, max_range_km, path,
+                 temporary=False):
+        self.matrix = matrix
+        self.site_ids = site_ids
+        self.target_ids = target_ids
+        self.pair_sites = pair_sites
+        self.pair_targets = pair_targets
+        self.pair_distances = pair_distances
+        self.max_range_km = max_range_km
+        self.path = path
+        self.temporary = temporary
+        self._cleanup = weakref.finalize(self, _remove_file, path) if temporary else None
+
+    def close(self):
+        """
+        Deletes the backing file if it is a temp file.
+        """
+        if self._cleanup is not None:
+            self._cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def num_pairs(self):
+        return len(self.pair_sites)
+
+    def pairs_frame(self):
+        """
+        The reachable pairs as a DataFrame of site_id, target_id and distance_km.
+        """
+        return pd.DataFrame({
+            'site_id': self.site_ids[self.pair_sites],
+            'target_id': self.target_ids[self.pair_targets],
+            'distance_km': self.pair_distances
+        })
+
+    def to_frame(self):
+        """
+        The dense matrix as a DataFrame, like the one get_data() returns without chunking.
+        Only meant for catalogs that fit in memory.
+        """
+        return pd.DataFrame(np.asarray(self.matrix), index=self.site_ids, columns=self.target_ids)
+
+
+def compute_distances_chunked(sites, targets, max_range_km, path=None, chunk_size=2048):
+    """
+    Computes the haversine distance matrix block by block into a np.memmap file.
+
+    Each chunk_size x chunk_size block is computed with vectorized NumPy, written to the
+    file and scanned for pairs within max_range_km, so peak memory is bounded by one block
+    plus the reachable pairs, regardless of how many sites and targets there are.
+    The file is created in the temp directory unless path is given; close the result
+    (or use it as a context manager) to delete that temp file.
+    """
+    temporary = path is None
+    if temporary:
+        fd, path = tempfile.mkstemp(prefix='shield-distances-', suffix='.f64')
+        os.close(fd)
+
+    site_lat = sites['y_coord'].to_numpy(dtype=np.float64)
+    site_lon = sites['x_coord'].to_numpy(dtype=np.float64)
+    target_lat = targets['y_coord'].to_numpy(dtype=np.float64)
+    target_lon = targets['x_coord'].to_numpy(dtype=np.float64)
+    num_sites, num_targets = len(site_lat), len(target_lat)
+
+    pair_sites, pair_targets, pair_distances = [], [], []
+    if num_sites == 0 or num_targets == 0:
+        # An empty file cannot be memory-mapped
+        matrix = np.zeros((num_sites, num_targets))
+    else:
+        matrix = np.memmap(path, dtype=np.float64, mode='w+', shape=(num_sites, num_targets))
+        for row in range(0, num_sites, chunk_size):
+            rows = slice(row, min(row + chunk_size, num_sites))
+            for col in range(0, num_targets, chunk_size):
+                cols = slice(col, min(col + chunk_size, num_targets))
+                block = haversine_distance(site_lat[rows, None], site_lon[rows, None],
+                                           target_lat[None, cols], target_lon[None, cols])
+                matrix[rows, cols] = block
+
+                hit_rows, hit_cols = np.nonzero(block <= max_range_km)
+                pair_sites.append((hit_rows + row).astype(np.int32))
+                pair_targets.append((hit_cols + col).astype(np.int32))
+                pair_distances.append(block[hit_rows, hit_cols])
+            matrix.flush()
+
+        # Reopen read-only so consumers cannot modify the file through the matrix
+        del matrix
+        matrix = np.memmap(path, dtype=np.float64, mode='r', shape=(num_sites, num_targets))
+
+    def concat(parts, dtype):
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    return ChunkedDistances(
+        matrix=matrix,
+        site_ids=sites.index.to_numpy(dtype=np.int64),
+        target_ids=targets.index.to_numpy(dtype=np.int64),
+        pair_sites=concat(pair_sites, np.int32),
+        pair_targets=concat(pair_targets, np.int32),
+        pair_distances=concat(pair_distances, np.float64),
+        max_range_km=float(max_range_km),
+        path=path,
+        temporary=temporary
+    )
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
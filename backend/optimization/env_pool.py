@@ -0,0 +1,71 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class EnvPool:
+    """
+    A fixed-size pool of started Gurobi environments shared by all solves.
+
+    Starting a gp.Env checks the license and sets up the solver, which is paid once per
+    environment here instead of once per model. Each environment is handed to one solve
+    at a time, since an Env must not be used by two threads concurrently.
+    gurobipy is only imported when the first environment is created.
+    """
+
+    def __init__(self, size=2, params=None):
+        self.size = size
+        self.params = dict(params or {})
+        self.warm_seconds = None
+        self._available = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _create_env(self):
+        import gurobipy as gp
+
+        env = gp.Env(empty=True)
+        for name, value in self.params.items():
+            env.setParam(name, value)
+        env.start()
+        self._all.append(env)
+        self._available.put(env)
+
+    def warm(self):
+        """
+        Creates and starts every environment in the pool up front.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            while len(self._all) < self.size:
+                self._create_env()
+        self.warm_seconds = time.perf_counter() - start
+        return self.warm_seconds
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """
+        Lends an environment for the duration of the with-block.
+
+        Blocks while the pool is still warming or every environment is in use.
+        If the pool was never warmed, environments are started on demand.
+        """
+        with self._lock:
+            if self._available.empty() and len(self._all) < self.size:
+                self._create_env()
+        env = self._available.get(timeout=timeout)
+        try:
+            yield env
+        finally:
+            self._available.put(env)
+
+    def close(self):
+        """
+        Disposes of every environment; the pool can be warmed again afterwards.
+        """
+        with self._lock:
+            for env in self._all:
+                env.dispose()
+            self._all.clear()
+            self._available = queue.Queue()
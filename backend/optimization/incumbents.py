@@ -0,0 +1,80 @@
+import time
+from gurobipy import GRB
+
+
+def compute_gap(objective, bound):
+    """
+    Relative MIP gap, using the same definition as Gurobi's MIPGap attribute.
+    """
+    if objective is None or bound is None:
+        return None
+    if abs(objective) < 1e-10:
+        return 0.0 if abs(bound - objective) < 1e-10 else None
+    return abs(bound - objective) / abs(objective)
+
+
+def allocations_from_values(scenario_id, values):
+    """
+    Converts a {(site_id, type_id): value} mapping into allocation records.
+    """
+    allocations = []
+    for (i, m_type), value in values.items():
+        if value > 0.5:
+            allocations.append({
+                "scenario_id": scenario_id,
+                "site_id": int(i),
+                "type_id": int(m_type),
+                "allocated": int(round(value))
+            })
+    return allocations
+
+
+def make_incumbent_callback(x, scenario_id, instance, on_incumbent=None, stop_event=None, disaggregate=None):
+    """
+    Builds a Gurobi callback that reports each new incumbent and honours early acceptance.
+
+    on_incumbent is called with a dict holding the objective, bound, gap and the
+    allocation (with site and missile names) every time MIPSOL fires.
+    When stop_event is set, the solve is terminated and the current incumbent is kept.
+    disaggregate, if given, maps the values of x to per-site values (see SiteClasses).
+    """
+    keys = list(x.keys())
+    variables = [x[key] for key in keys]
+    start = time.perf_counter()
+
+    def callback(model, where):
+        if stop_event is not None and stop_event.is_set():
+            model.terminate()
+            return
+
+        if where == GRB.Callback.MIPSOL and on_incumbent is not None:
+            objective = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+            bound = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+            values = dict(zip(keys, model.cbGetSolution(variables)))
+            if disaggregate is not None:
+                values = disaggregate(values)
+
+            allocations = allocations_from_values(scenario_id, values)
+            for alloc in allocations:
+                alloc["site_name"] = instance.site_name(alloc["site_id"])
+                alloc["missile_name"] = instance.missile_name(alloc["type_id"])
+
+            on_incumbent({
+                "objective": objective,
+                "bound": bound,
+                "gap": compute_gap(objective, bound),
+                "elapsed": time.perf_counter() - start,
+                "solution_count": model.cbGet(GRB.Callback.MIPSOL_SOLCNT) + 1,
+                "allocations": allocations
+            })
+
+    return callback
+
+
+def has_usable_solution(m):
+    """
+    True if the model finished optimally or was stopped early with an incumbent available.
+    """
+    if m.status == GRB.OPTIMAL:
+        return True
+    return m.status in (GRB.INTERRUPTED, GRB.TIME_LIMIT) and m.SolCount > 0
@@ -0,0 +1,197 @@
+import time
+import numpy as np
+from gurobipy import GRB
+from .incumbents import allocations_from_values
+from .optimizer import build_scenario_model
+from .presolve import SiteClasses
+from .profiling import PhaseTimer
+from .robust_optimizer import build_robust_model, get_realistic_probabilities
+
+
+def active_site_indices(instance, scenario_id):
+    """
+    Sites the model of a scenario may use: Qatar is inactive in scenario 3 and in the robust model (scenario 0).
+    """
+    if scenario_id in (0, 3):
+        return np.flatnonzero(~instance.qatar_mask())
+    return np.arange(instance.num_sites)
+
+
+def proximity_order(instance, site_idx, seeds, block_rows=4096):
+    """
+    Positions into site_idx ordered by closeness to the seed positions.
+
+    Two sites are close when their rows of the distance matrix are similar, i.e. they
+    sit at similar distances from every target; the seeds themselves come first.
+    The rows are read block_rows sites at a time and compared with one seed at a time,
+    keeping a running minimum, so memory stays at one block however many seeds there are.
+    """
+    site_idx = np.asarray(site_idx)
+    seed_profiles = instance.distances[site_idx[sorted(seeds)]]
+    gaps = np.full(len(site_idx), np.inf)
+    for start in range(0, len(site_idx), block_rows):
+        rows = slice(start, start + block_rows)
+        block = instance.distances[site_idx[rows]]
+        for seed_profile in seed_profiles:
+            np.minimum(gaps[rows], np.abs(block - seed_profile).mean(axis=1), out=gaps[rows])
+    return np.argsort(gaps, kind='stable')
+
+
+def changed_neighborhood(instance, site_idx, previous, changed_site_ids=(), changed_target_ids=()):
+    """
+    Positions into site_idx of the sites touched by a data change.
+
+    These are the changed sites, every site that can reach a changed target with some
+    missile type, and every site whose previous allocation no longer fits: above its
+    capacity, or below the one-missile minimum.
+    """
+    site_ids = instance.site_ids[site_idx].tolist()
+    type_ids = instance.type_ids.tolist()
+    changed_site_ids = {int(i) for i in changed_site_ids}
+    positions = {k for k, i in enumerate(site_ids) if i in changed_site_ids}
+
+    target_idx = [instance.target_index[int(t)] for t in changed_target_ids if int(t) in instance.target_index]
+    if target_idx:
+        reaches = instance.reachability(site_idx, target_idx).any(axis=(1, 2))
+        positions.update(np.flatnonzero(reaches).tolist())
+
+    for k, i in enumerate(site_ids):
+        total = sum(previous.get((i, m_type), 0) for m_type in type_ids)
+        if total > instance.capacity[site_idx[k]] or total < 1:
+            positions.add(k)
+
+    return positions
+
+
+def run_lns(scenario_id, instance, previous, changed_site_ids=(), changed_target_ids=(), time_budget=5.0,
+            neighborhood_size=4, max_stall=None, env=None, model_cache=None, timer=None, seed=0):
+    """
+    Large Neighborhood Search around a previous allocation of a scenario (0 = robust).
+
+    previous maps (site_id, type_id) to the stored allocation. Each iteration fixes x[i, m]
+    to the incumbent for every site outside a neighborhood and re-solves the small
+    subproblem, with the incumbent as MIP start. The first neighborhood holds the sites
+    affected by the change (see changed_neighborhood), later ones a random site and its
+    nearest neighbors. A neighborhood whose subproblem is infeasible, e.g. because the
+    fixed sites exhaust a missile stock, is doubled and solved again.
+
+    The search stops when time_budget seconds are used up, after max_stall consecutive
+    iterations without improvement (default: one per site), or once a neighborhood
+    covering every site has been solved to optimality. Returns None if no feasible
+    allocation was found, otherwise a dict with the allocations, the objective, the
+    number of changed (site, type) cells compared with previous, and a log of the iterations.
+    The model is built per site (no site aggregation), so neighborhoods map to real sites.
+    """
+    timer = timer or PhaseTimer()
+    deadline = time.perf_counter() + time_budget
+    rng = np.random.default_rng(seed)
+
+    site_idx = active_site_indices(instance, scenario_id)
+    classes = SiteClasses.singletons(instance, site_idx)
+    site_ids = classes.rep_ids
+    type_ids = instance.type_ids.tolist()
+
+    # --- Build (or reload) the full model once ---
+    with timer.phase("build_model"):
+        if scenario_id == 0:
+            probabilities = get_realistic_probabilities()
+            mode, options = "robust", {"probabilities": sorted(probabilities.items())}
+        else:
+            mode, options = f"scenario_{scenario_id}", {}
+
+        cached = None
+        if model_cache is not None:
+            cache_key = model_cache.key(instance, mode, aggregate_sites=False, **options)
+            cached = model_cache.load(cache_key, env=env)
+
+        if cached is not None:
+            m, x = cached
+        else:
+            if scenario_id == 0:
+                m, x = build_robust_model(instance, classes, probabilities, env=env)
+            else:
+                target_idx = instance.scenario_target_indices(scenario_id)
+                m, x = build_scenario_model(instance, scenario_id, classes, target_idx, env=env)
+            if model_cache is not None:
+                model_cache.store(cache_key, m, x)
+
+    m.setParam('OutputFlag', 0)
+    m.setParam('NonConvex', 2)
+    bounds = {key: (var.LB, var.UB) for key, var in x.items()}
+
+    incumbent = {(i, m_type): int(previous.get((i, m_type), 0)) for i in site_ids for m_type in type_ids}
+    incumbent_objective = None
+    iterations = []
+    max_stall = max_stall or len(site_ids)
+    stall = 0
+
+    neighborhood = changed_neighborhood(instance, site_idx, previous, changed_site_ids, changed_target_ids)
+    if not neighborhood:
+        neighborhood = {int(rng.integers(len(site_ids)))}
+    size = max(neighborhood_size, len(neighborhood))
+
+    # --- Search ---
+    with timer.phase("optimize"):
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+
+            free = set(proximity_order(instance, site_idx, neighborhood)[:size].tolist())
+            free_ids = {site_ids[k] for k in free}
+
+            # Fix every site outside the neighborhood to the incumbent
+            for key, var in x.items():
+                if key[0] in free_ids:
+                    var.LB, var.UB = bounds[key]
+                else:
+                    var.LB = var.UB = incumbent[key]
+                var.Start = incumbent[key]
+
+            m.setParam('TimeLimit', min(remaining, max(0.5, time_budget / 4)))
+            started = time.perf_counter()
+            m.optimize()
+
+            iteration = {
+                "sites": len(free),
+                "status": int(m.status),
+                "objective": m.ObjVal if m.SolCount > 0 else None,
+                "seconds": round(time.perf_counter() - started, 4)
+            }
+            iterations.append(iteration)
+
+            if m.SolCount > 0:
+                if incumbent_objective is None or m.ObjVal > incumbent_objective + 1e-6 * abs(incumbent_objective):
+                    incumbent = {key: int(round(var.X)) for key, var in x.items()}
+                    incumbent_objective = m.ObjVal
+                    stall = 0
+                else:
+                    stall += 1
+                if stall >= max_stall or (len(free) == len(site_ids) and m.status == GRB.OPTIMAL):
+                    break
+                # Move on to a random geographic neighborhood
+                neighborhood = {int(rng.integers(len(site_ids)))}
+                size = min(neighborhood_size, len(site_ids))
+            else:
+                if len(free) == len(site_ids):
+                    break
+                # Too constrained (or no solution in time): widen the same neighborhood
+                size = min(len(site_ids), 2 * len(free))
+
+    m.dispose()
+
+    if incumbent_objective is None:
+        print(f"LNS found no feasible allocation for scenario {scenario_id}.")
+        return None
+
+    changed_cells = sum(1 for key, value in incumbent.items() if value != int(previous.get(key, 0)))
+    changed_cells += sum(1 for key, value in previous.items() if key not in incumbent and value)
+    print(f"LNS for scenario {scenario_id}: objective {incumbent_objective:.2f} after {len(iterations)} "
+          f"iterations, {changed_cells} allocation cells changed")
+
+    return {
+        "allocations": allocations_from_values(scenario_id, incumbent),
+        "objective": incumbent_objective,
+        "changed_cells": changed_cells,
+        "iterations": iterations
+    }
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Bump whenever the model formulation changes, so artifacts built by older code are never reused
+MODEL_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model_cache')
+
+
+class ModelCache:
+    """
+    On-disk cache of built Gurobi models.
+
+    Each entry is the model written as <key>.mps plus <key>.json, which maps the
+    names of the allocation variables x back to their (site_id, type_id) keys.
+    Keys combine the ProblemInstance fingerprint with the model mode and build options,
+    so a solve on unchanged inputs reloads the artifact with gp.read instead of
+    rebuilding every constraint in Python. Solver parameters are not part of the
+    artifact and are set by the caller after loading.
+
+    Entries older than max_age_seconds are dropped, and the least recently used
+    entries are evicted once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024, max_age_seconds=7 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+
+    def key(self, instance, mode, **options):
+        """
+        Cache key for a model of the given mode ("scenario_1", "robust", ...) built from instance.
+        """
+        digest = hashlib.sha1()
+        digest.update(f"v{MODEL_FORMAT_VERSION}|{mode}|{json.dumps(options, sort_keys=True)}|".encode())
+        digest.update(instance.fingerprint().encode())
+        return digest.hexdigest()[:24]
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return f"{base}.mps", f"{base}.json"
+
+    def load(self, key, env=None):
+        """
+        Returns (model, x) for a cached artifact, or None on a miss or an expired entry.
+        """
+        import gurobipy as gp
+
+        model_path, map_path = self._paths(key)
+        try:
+            if time.time() - os.path.getmtime(map_path) > self.max_age_seconds:
+                self._remove(key)
+                return None
+            with open(map_path) as f:
+                var_map = json.load(f)
+            model = gp.read(model_path, env=env)
+        except (OSError, ValueError, gp.GurobiError):
+            return None
+
+        variables = {var.VarName: var for var in model.getVars()}
+        x = {(i, m_type): variables[name] for i, m_type, name in var_map["x"]}
+
+        # Touch the entry so eviction keeps recently used models
+        now = time.time()
+        for path in (model_path, map_path):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return model, x
+
+    def store(self, key, model, x):
+        """
+        Writes the built model and its variable map, then enforces the size and age limits.
+
+        Files are written under temporary names and renamed into place, so concurrent
+        solves never read a half-written artifact.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        model_path, map_path = self._paths(key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+        model.update()
+        model.write(model_path + suffix + ".mps")
+        with open(map_path + suffix, 'w') as f:
+            json.dump({"x": [[int(i), int(m_type), var.VarName] for (i, m_type), var in x.items()]}, f)
+
+        os.replace(model_path + suffix + ".mps", model_path)
+        os.replace(map_path + suffix, map_path)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes expired entries, then the least recently used ones until the cache fits in max_bytes.
+        """
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                return
+
+            entries = {}
+            for name in os.listdir(self.directory):
+                key, ext = os.path.splitext(name)
+                if ext not in ('.mps', '.json') or '.' in key:
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                size, used = entries.get(key, (0, 0))
+                entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+
+            now = time.time()
+            total = 0
+            for key, (size, used) in list(entries.items()):
+                if now - used > self.max_age_seconds:
+                    self._remove(key)
+                    del entries[key]
+                else:
+                    total += size
+
+            for key, (size, used) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes:
+                    break
+                self._remove(key)
+                total -= size
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,45 +1,35 @@
 import pandas as pd
 import gurobipy as gp
 from gurobipy import GRB
-from sqlalchemy import create_engine, text
-import os
 import numpy as np
-
-def haversine_distance(lat1, lon1, lat2, lon2):
+from database import get_engine, replace_allocation
+from .distances import haversine_distance, compute_distances_chunked
+from .incumbents import make_incumbent_callback, has_usable_solution
+from .problem_instance import ProblemInstance
+from .profiling import PhaseTimer
+from .tuning import apply_tuning_profile
+from .presolve import (SiteClasses, aggregate_equivalent_sites, aggregated_defense_curve,
+                       collapse_coverage_targets)
+
+def get_data(timer=None, chunked=False, chunk_size=2048, distance_path=None):
     """
-    Calculate the distance between two points on Earth in kilometers.
+    Connects to the configured database and loads all necessary tables into pandas DataFrames.
+    A PhaseTimer passed as timer records the load_data and distances phases.
+
+    With chunked=True the distances are computed block by block into a memory-mapped file
+    (distance_path, or a temp file) and returned as a ChunkedDistances, which also holds the
+    sparse (site, target) pairs within the longest missile range. Use it for catalogs whose
+    dense distance DataFrame would not fit in memory, and close() it (or use it as a context
+    manager) once done, which deletes the temp file.
     """
-    R = 6371  # Radius of Earth in kilometers
-    
-    lat1_rad = np.radians(lat1)
-    lon1_rad = np.radians(lon1)
-    lat2_rad = np.radians(lat2)
-    lon2_rad = np.radians(lon2)
-    
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    
-    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    
-    return R * c
+    timer = timer or PhaseTimer()
 
-def get_data():
-    """
-    Connects to the SQLite database and loads all necessary tables into pandas DataFrames.
-    """
     # --- Database Connection ---
-    # Calculate the path to the database file relative to this script
-    OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-    PROJECT_ROOT = os.path.dirname(os.path.dirname(OPTIMIZER_DIR))
-    DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-    
-    if not os.path.exists(DB_PATH):
-        raise FileNotFoundError(f"Database file not found at {DB_PATH}. Please run the ETL script first.")
-
-    engine = create_engine(f"sqlite:///{DB_PATH}")
+    # The database URL comes from STRATEGIC_SHIELD_DATABASE_URL, defaulting to the SQLite file
+    engine = get_engine()
 
     # --- Load Data ---
+    timer.start("load_data")
     print("Loading data from database...")
     sites = pd.read_sql("SELECT * FROM DeploymentSite", engine, index_col='site_id')
     missiles = pd.read_sql("SELECT * FROM MissileType", engine, index_col='type_id')
@@ -49,65 +39,79 @@ def get_data():
     scenario_targets = pd.read_sql("SELECT * FROM ScenarioTarget", engine)
     print("Data loaded successfully.")
 
+    # PostgreSQL returns DECIMAL columns as Decimal objects; the model needs floats
+    for frame, columns in ((sites, ['x_coord', 'y_coord']),
+                           (targets, ['x_coord', 'y_coord']),
+                           (missiles, ['range_km', 'warhead_multiplier', 'accuracy_multiplier'])):
+        frame[columns] = frame[columns].astype(float)
+
     # --- Combine Missile Data ---
     # For convenience, merge the missile properties and inventory into a single DataFrame
     missiles = missiles.join(inventory)
+    timer.stop("load_data")
 
     # Calculate distance between all sites and targets
+    timer.start("distances")
+    if chunked:
+        max_range_km = missiles['range_km'].max() if len(missiles) else 0.0
+        distances = compute_distances_chunked(sites, targets, max_range_km, path=distance_path, chunk_size=chunk_size)
+        print(f"Computed {len(sites)} x {len(targets)} distances in chunks of {chunk_size}: "
+              f"{distances.num_pairs} pairs within {max_range_km:.0f} km")
+        timer.stop("distances")
+        return sites, missiles, scenarios, targets, scenario_targets, distances
+
     distances = pd.DataFrame(index=sites.index, columns=targets.index)
     for s_id, site in sites.iterrows():
         for t_id, target in targets.iterrows():
             distances.loc[s_id, t_id] = haversine_distance(site['y_coord'], site['x_coord'], target['y_coord'], target['x_coord'])
+    timer.stop("distances")
     
     return sites, missiles, scenarios, targets, scenario_targets, distances
 
-def run_optimization_for_scenario(scenario_id, sites, missiles, scenarios, targets, scenario_targets, distances):
+def build_scenario_model(instance, scenario_id, classes, target_idx, env=None):
     """
-    Builds and solves the optimization model according to the exact mathematical formulation.
-    Uses logarithmic and exponential constraints for exact power calculations.
+    Builds the Gurobi model of one scenario over the given site classes and targets.
+
+    Returns the model and its allocation variables x, keyed by (representative site_id, type_id).
+    Solver parameters are left to the caller, so the same build can be cached on disk.
     """
-    # --- Filter Data for the Current Scenario ---
-    scenario_name = scenarios.loc[scenario_id]['name']
-    print(f"--- Starting Optimization for Scenario {scenario_id}: {scenario_name} ---")
+    class_idx = classes.rep_idx
+    class_size = classes.sizes
 
-    # SPECIAL CASE: For US-Israel Coalition (scenario 3), exclude Qatar sites
-    # Qatar is closer to US, so it should be inactive in this scenario
-    if scenario_id == 3:
-        # Filter out Qatar sites (containing "Qatar" in the name)
-        active_sites = sites[~sites['name'].str.contains('Qatar', case=False, na=False)]
-        print(f"US-Israel Coalition: Qatar sites excluded. Active sites: {len(active_sites)} (was {len(sites)})")
-    else:
-        active_sites = sites
-        print(f"All sites active: {len(active_sites)}")
+    # Plain Python ids keep Gurobi variable names identical to the DataFrame-based model.
+    # x is indexed by each class's representative site, which for singleton classes is the site itself.
+    site_ids = classes.rep_ids
+    target_ids = instance.target_ids[target_idx].tolist()
+    type_ids = instance.type_ids.tolist()
 
-    # Get the specific targets for this scenario
-    target_ids_for_scenario = scenario_targets[scenario_targets['scenario_id'] == scenario_id]['target_id']
-    scenario_target_data = targets.loc[target_ids_for_scenario]
+    # Presolve: one coverage term per distinct hitting set and missile type
+    reach = instance.reachability(class_idx, target_idx)  # reach[i, t, m]: d_{i,t} <= range_m
+    target_priority = instance.target_priority[target_idx]
+    coverage = collapse_coverage_targets(reach, target_ids, target_priority, type_ids)
+    coverage_keys = [key for key, _, _, _ in coverage]
 
     # --- Create Gurobi Model ---
-    m = gp.Model(f"StrategicShield_{scenario_id}")
-    m.setParam('OutputFlag', 1)
-    m.setParam('NonConvex', 2)  # Enable nonconvex optimization for exp/log constraints
+    m = gp.Model(f"StrategicShield_{scenario_id}", env=env)
 
-    print(f"Scenario has {len(scenario_target_data)} targets")
-    print(f"Available sites: {len(active_sites)}")
-    print(f"Available missile types: {len(missiles)}")
+    print(f"Scenario has {len(target_ids)} targets")
+    print(f"Available sites: {classes.num_sites} ({len(site_ids)} classes)")
+    print(f"Available missile types: {len(type_ids)}")
 
     # --- Decision Variables ---
     
-    # Primary decision variables: x[i,m] = number of missiles of type m at site i
-    x = m.addVars(active_sites.index, missiles.index, vtype=GRB.INTEGER, name="x")
+    # Primary decision variables: x[i,m] = number of missiles of type m at site (class) i
+    x = m.addVars(site_ids, type_ids, vtype=GRB.INTEGER, name="x")
     
-    # Auxiliary variables for attack (coverage) calculations
-    t_r = m.addVars(scenario_target_data.index, missiles.index, vtype=GRB.CONTINUOUS, 
+    # Auxiliary variables for attack (coverage) calculations, one per collapsed target group
+    t_r = m.addVars(coverage_keys, vtype=GRB.CONTINUOUS, 
                     lb=-GRB.INFINITY, name="t_r")  # log-scaled coverage count
-    y_r = m.addVars(scenario_target_data.index, missiles.index, vtype=GRB.CONTINUOUS, 
+    y_r = m.addVars(coverage_keys, vtype=GRB.CONTINUOUS, 
                     lb=0, name="y_r")  # 0.9^N_{t,m}
     
     # Auxiliary variables for defense calculations  
-    t_d = m.addVars(active_sites.index, missiles.index, vtype=GRB.CONTINUOUS,
+    t_d = m.addVars(site_ids, type_ids, vtype=GRB.CONTINUOUS,
                     lb=-GRB.INFINITY, name="t_d")  # log-scaled defense count
-    y_d = m.addVars(active_sites.index, missiles.index, vtype=GRB.CONTINUOUS,
+    y_d = m.addVars(site_ids, type_ids, vtype=GRB.CONTINUOUS,
                     lb=0, name="y_d")  # 0.8^x_{i,m}
 
     # Update model after adding variables
@@ -118,57 +122,56 @@ def run_optimization_for_scenario(scenario_id, sites, missiles, scenarios, targe
     d = 1.0  # Global scaling coefficient
     ln_09 = np.log(0.9)  # ln(0.9)
     ln_08 = np.log(0.8)  # ln(0.8)
+    capacity = instance.capacity[class_idx] * class_size  # pooled capacity of each class
+    site_priority = instance.site_priority[class_idx]
+    effectiveness = instance.effectiveness()  # w_m * a_m
 
     # --- Constraints ---
     
     # (1) Site capacity constraint: ∑_{m∈M} x_{i,m} ≤ capacity_i ∀i∈S
-    for i in active_sites.index:
-        m.addConstr(gp.quicksum(x[i, m_type] for m_type in missiles.index) <= active_sites.loc[i, 'capacity'], 
+    for k, i in enumerate(site_ids):
+        m.addConstr(gp.quicksum(x[i, m_type] for m_type in type_ids) <= int(capacity[k]), 
                    name=f"SiteCapacity_{i}")
     print("Added site capacity constraints.")
 
     # (2) Missile stock constraint: ∑_{i∈S} x_{i,m} ≤ stock_m ∀m∈M
-    for m_type in missiles.index:
-        m.addConstr(gp.quicksum(x[i, m_type] for i in active_sites.index) <= missiles.loc[m_type, 'total_stock'],
+    for n, m_type in enumerate(type_ids):
+        m.addConstr(gp.quicksum(x[i, m_type] for i in site_ids) <= int(instance.total_stock[n]),
                    name=f"MissileStock_{m_type}")
     print("Added missile stock constraints.")
 
-    # (3) Minimum deployment constraint: ∑_{m∈M} x_{i,m} ≥ 1 ∀i∈S
-    for i in active_sites.index:
-        m.addConstr(gp.quicksum(x[i, m_type] for m_type in missiles.index) >= 1,
+    # (3) Minimum deployment constraint: ∑_{m∈M} x_{i,m} ≥ 1 ∀i∈S (one per member site for classes)
+    for k, i in enumerate(site_ids):
+        m.addConstr(gp.quicksum(x[i, m_type] for m_type in type_ids) >= int(class_size[k]),
                    name=f"MinDeployment_{i}")
     print("Added minimum deployment constraints.")
 
     # (4) Log-scaled coverage count: t^{(r)}_{t,m} = ln(0.9) * ∑_{i:d_{i,t}≤range_m} x_{i,m}
-    for t in scenario_target_data.index:
-        for m_type in missiles.index:
-            # Find sites that can hit target t with missile type m
-            hitting_sites = [i for i in active_sites.index 
-                           if distances.loc[i, t] <= missiles.loc[m_type, 'range_km']]
-            
-            if hitting_sites:
-                N_tm = gp.quicksum(x[i, m_type] for i in hitting_sites)
-                m.addConstr(t_r[t, m_type] == ln_09 * N_tm, name=f"LogCoverage_{t}_{m_type}")
-            else:
-                # No sites can hit this target with this missile type
-                m.addConstr(t_r[t, m_type] == 0, name=f"LogCoverage_{t}_{m_type}")
+    # Targets sharing a hitting set share this term; unreachable targets have none.
+    for (t, m_type), n, hitting, weight in coverage:
+        N_tm = gp.quicksum(x[site_ids[k], m_type] for k in hitting)
+        m.addConstr(t_r[t, m_type] == ln_09 * N_tm, name=f"LogCoverage_{t}_{m_type}")
 
     # (5) Exponential constraint: y^{(r)}_{t,m} = exp(t^{(r)}_{t,m}) = 0.9^{N_{t,m}}
-    for t in scenario_target_data.index:
-        for m_type in missiles.index:
-            m.addGenConstrExp(t_r[t, m_type], y_r[t, m_type], name=f"ExpCoverage_{t}_{m_type}")
+    for t, m_type in coverage_keys:
+        m.addGenConstrExp(t_r[t, m_type], y_r[t, m_type], name=f"ExpCoverage_{t}_{m_type}")
 
     print("Added coverage (attack) constraints with exact exponential calculations.")
 
     # (6) Log-scaled defense count: t^{(d)}_{i,m} = ln(0.8) * x_{i,m}
-    for i in active_sites.index:
-        for m_type in missiles.index:
-            m.addConstr(t_d[i, m_type] == ln_08 * x[i, m_type], name=f"LogDefense_{i}_{m_type}")
-
     # (7) Exponential constraint: y^{(d)}_{i,m} = exp(t^{(d)}_{i,m}) = 0.8^{x_{i,m}}
-    for i in active_sites.index:
-        for m_type in missiles.index:
-            m.addGenConstrExp(t_d[i, m_type], y_d[i, m_type], name=f"ExpDefense_{i}_{m_type}")
+    # For a class of n sites, y^{(d)}_{c,m} = ∑_{i∈c} 0.8^{x_{i,m}} under an even split, which is
+    # exactly piecewise linear between integer totals.
+    for k, i in enumerate(site_ids):
+        for n, m_type in enumerate(type_ids):
+            if class_size[k] == 1:
+                m.addConstr(t_d[i, m_type] == ln_08 * x[i, m_type], name=f"LogDefense_{i}_{m_type}")
+                m.addGenConstrExp(t_d[i, m_type], y_d[i, m_type], name=f"ExpDefense_{i}_{m_type}")
+            else:
+                upper = int(min(capacity[k], instance.total_stock[n]))
+                xs, ys = aggregated_defense_curve(int(class_size[k]), upper)
+                x[i, m_type].UB = upper
+                m.addGenConstrPWL(x[i, m_type], y_d[i, m_type], xs, ys, name=f"PWLDefense_{i}_{m_type}")
 
     print("Added defense constraints with exact exponential calculations.")
 
@@ -178,34 +181,23 @@ def run_optimization_for_scenario(scenario_id, sites, missiles, scenarios, targe
     # --- Objective Function ---
     
     # Attack-weighted coverage: ∑_{t∈T} π_t * 10d * ∑_{m∈M} w_m * a_m * (1 - y^{(r)}_{t,m})/(1 - 0.9)
+    # Each collapsed group carries the summed priority π of its targets.
     attack_bonus = gp.LinExpr()
-    for t in scenario_target_data.index:
-        pi_t = scenario_target_data.loc[t, 'priority']  # π_t
-        
-        target_coverage = gp.LinExpr()
-        for m_type in missiles.index:
-            w_m = missiles.loc[m_type, 'warhead_multiplier']  # w_m
-            a_m = missiles.loc[m_type, 'accuracy_multiplier']  # a_m
-            
-            # (1 - y^{(r)}_{t,m}) / (1 - 0.9)
-            coverage_term = (1 - y_r[t, m_type]) / (1 - 0.9)
-            target_coverage += w_m * a_m * coverage_term
-        
-        attack_bonus += pi_t * 10 * d * target_coverage
+    for (t, m_type), n, hitting, weight in coverage:
+        # (1 - y^{(r)}_{t,m}) / (1 - 0.9)
+        coverage_term = (1 - y_r[t, m_type]) / (1 - 0.9)
+        attack_bonus += weight * 10 * d * float(effectiveness[n]) * coverage_term
     
     # Defense-weighted fortification: ∑_{i∈S} δ_i * 20d * ∑_{m∈M} w_m * a_m * (1 - y^{(d)}_{i,m})/(1 - 0.8)
     defense_bonus = gp.LinExpr()
-    for i in active_sites.index:
-        delta_i = active_sites.loc[i, 'priority']  # δ_i
+    for k, i in enumerate(site_ids):
+        delta_i = float(site_priority[k])  # δ_i
         
         site_defense = gp.LinExpr()
-        for m_type in missiles.index:
-            w_m = missiles.loc[m_type, 'warhead_multiplier']  # w_m
-            a_m = missiles.loc[m_type, 'accuracy_multiplier']  # a_m
-            
-            # (1 - y^{(d)}_{i,m}) / (1 - 0.8)
-            defense_term = (1 - y_d[i, m_type]) / (1 - 0.8)
-            site_defense += w_m * a_m * defense_term
+        for n, m_type in enumerate(type_ids):
+            # (1 - y^{(d)}_{i,m}) / (1 - 0.8), summed over the members of a class
+            defense_term = (int(class_size[k]) - y_d[i, m_type]) / (1 - 0.8)
+            site_defense += float(effectiveness[n]) * defense_term
         
         defense_bonus += delta_i * 20 * d * site_defense
 
@@ -214,50 +206,148 @@ def run_optimization_for_scenario(scenario_id, sites, missiles, scenarios, targe
     m.setObjective(objective, GRB.MAXIMIZE)
     print("Set objective function with exact exponential formulation.")
 
-    # --- Solve ---
-    print("Starting optimization...")
-    m.optimize()
+    return m, x
+
+
+def run_optimization_for_scenario(scenario_id, sites=None, missiles=None, scenarios=None, targets=None,
+                                  scenario_targets=None, distances=None, on_incumbent=None, stop_event=None,
+                                  instance=None, env=None, aggregate_sites=True, model_cache=None, timer=None,
+                                  solution_pool=None):
+    """
+    Builds and solves the optimization model according to the exact mathematical formulation.
+    Uses logarithmic and exponential constraints for exact power calculations.
+
+    The inputs are either the DataFrames from get_data() or a prebuilt ProblemInstance
+    (e.g. one memory-mapped by a worker process) passed as instance.
+    If on_incumbent is given it receives every new incumbent found during the solve.
+    Setting stop_event accepts the current incumbent and stops the solver early.
+    env lets the caller supply an already started gp.Env (see EnvPool); by default
+    the model uses Gurobi's default environment.
+    With aggregate_sites, interchangeable sites are merged into classes before the
+    model is built and the solution is split back per site exactly (see presolve.py).
+    With a ModelCache, a model built earlier from identical inputs is reloaded from disk
+    instead of being rebuilt (see model_cache.py).
+    A stored tuning profile for the model's size class is applied before solving (see tuning.py).
+    A SolutionPool passed as solution_pool turns on Gurobi's solution pool and receives
+    the top distinct allocations of the solve (see solution_pool.py).
+    A PhaseTimer passed as timer records the prepare_instance, build_model (or
+    load_cached_model), optimize and extract_results phases.
+    """
+    timer = timer or PhaseTimer()
+    timer.start("prepare_instance")
+    if instance is None:
+        instance = ProblemInstance.from_frames(sites, missiles, scenarios, targets, scenario_targets, distances)
+
+    # --- Filter Data for the Current Scenario ---
+    scenario_name = instance.scenario_name(scenario_id)
+    print(f"--- Starting Optimization for Scenario {scenario_id}: {scenario_name} ---")
+
+    # SPECIAL CASE: For US-Israel Coalition (scenario 3), exclude Qatar sites
+    # Qatar is closer to US, so it should be inactive in this scenario
+    if scenario_id == 3:
+        # Filter out Qatar sites (containing "Qatar" in the name)
+        site_idx = np.flatnonzero(~instance.qatar_mask())
+        print(f"US-Israel Coalition: Qatar sites excluded. Active sites: {len(site_idx)} (was {instance.num_sites})")
+    else:
+        site_idx = np.arange(instance.num_sites)
+        print(f"All sites active: {len(site_idx)}")
 
-    # --- Process Results ---
-    if m.status == GRB.OPTIMAL:
-        print(f"\n--- Optimal Solution Found ---")
-        print(f"Objective Value: {m.objVal:.2f}")
+    # Get the specific targets for this scenario
+    target_idx = instance.scenario_target_indices(scenario_id)
+
+    # Presolve: merge sites that are interchangeable in every constraint into classes
+    if aggregate_sites:
+        classes = aggregate_equivalent_sites(instance, site_idx, target_idx)
+    else:
+        classes = SiteClasses.singletons(instance, site_idx)
+    timer.stop("prepare_instance")
+
+    # Reload the built model from the on-disk cache when the inputs are unchanged
+    m = x = None
+    if model_cache is not None:
+        with timer.phase("load_cached_model"):
+            cache_key = model_cache.key(instance, f"scenario_{scenario_id}", aggregate_sites=aggregate_sites)
+            cached = model_cache.load(cache_key, env=env)
+        if cached is not None:
+            m, x = cached
+            print(f"Loaded compiled model {cache_key} from the model cache.")
+
+    if m is None:
+        with timer.phase("build_model"):
+            m, x = build_scenario_model(instance, scenario_id, classes, target_idx, env=env)
+            if model_cache is not None:
+                model_cache.store(cache_key, m, x)
+
+    # Dispose of the model before the caller returns a pooled Env to the next thread; the
+    # callback closure keeps the model alive until the cycle collector would free it
+    try:
+        m.setParam('OutputFlag', 1)
+        m.setParam('NonConvex', 2)  # Enable nonconvex optimization for exp/log constraints
+        apply_tuning_profile(m, "scenario")
+        if solution_pool is not None:
+            solution_pool.configure(m)
+        type_ids = instance.type_ids.tolist()
+
+        # --- Solve ---
+        print("Starting optimization...")
+        with timer.phase("optimize"):
+            m.optimize(make_incumbent_callback(x, scenario_id, instance, on_incumbent, stop_event,
+                                               disaggregate=classes.disaggregate))
+
+        # --- Process Results ---
+        if has_usable_solution(m):
+            timer.start("extract_results")
+            if m.status == GRB.OPTIMAL:
+                print(f"\n--- Optimal Solution Found ---")
+            else:
+                print(f"\n--- Incumbent Accepted Early (gap {m.MIPGap:.2%}) ---")
+            print(f"Objective Value: {m.objVal:.2f}")
         
-        result_allocations = []
-        total_missiles = 0
+            result_allocations = []
+            total_missiles = 0
+
+            # Split class totals back into per-site allocations
+            values = classes.disaggregate({key: var.X for key, var in x.items()})
         
-        print("\nDetailed Allocation:")
-        for i in active_sites.index:
-            site_total = 0
-            site_allocations = []
-            for m_type in missiles.index:
-                if x[i, m_type].X > 0.5:  # If allocation > 0
-                    allocated = int(round(x[i, m_type].X))
-                    alloc = {
-                        "scenario_id": scenario_id,
-                        "site_id": i,
-                        "type_id": m_type,
-                        "allocated": allocated
-                    }
-                    result_allocations.append(alloc)
-                    site_allocations.append(f"{allocated}×{missiles.loc[m_type,'name']}")
-                    site_total += allocated
-                    total_missiles += allocated
+            print("\nDetailed Allocation:")
+            for i in classes.site_ids:
+                site_total = 0
+                site_allocations = []
+                for m_type in type_ids:
+                    if values[i, m_type] > 0:  # If allocation > 0
+                        allocated = values[i, m_type]
+                        alloc = {
+                            "scenario_id": scenario_id,
+                            "site_id": i,
+                            "type_id": m_type,
+                            "allocated": allocated
+                        }
+                        result_allocations.append(alloc)
+                        site_allocations.append(f"{allocated}×{instance.missile_name(m_type)}")
+                        site_total += allocated
+                        total_missiles += allocated
             
-            if site_allocations:
-                print(f"  {active_sites.loc[i,'name']}: {', '.join(site_allocations)} (Total: {site_total})")
+                if site_allocations:
+                    print(f"  {instance.site_name(i)}: {', '.join(site_allocations)} (Total: {site_total})")
         
-        print(f"\nTotal missiles deployed: {total_missiles}")
-        print("---------------------------\n")
-        return result_allocations
-    else:
-        print(f"Optimization failed. Status: {m.status}")
-        if m.status == GRB.INFEASIBLE:
-            print("Model is infeasible. Computing IIS...")
-            m.computeIIS()
-            m.write("model.ilp")
-            print("IIS written to model.ilp")
-        return None
+            print(f"\nTotal missiles deployed: {total_missiles}")
+            print("---------------------------\n")
+
+            if solution_pool is not None:
+                solution_pool.collect(m, x, scenario_id, disaggregate=classes.disaggregate)
+                print(f"Solution pool: {len(solution_pool.solutions)} distinct allocations")
+            timer.stop("extract_results")
+            return result_allocations
+        else:
+            print(f"Optimization failed. Status: {m.status}")
+            if m.status == GRB.INFEASIBLE:
+                print("Model is infeasible. Computing IIS...")
+                m.computeIIS()
+                m.write("model.ilp")
+                print("IIS written to model.ilp")
+            return None
+    finally:
+        m.dispose()
 
 
 def main():
@@ -282,20 +372,15 @@ def main():
     if results:
         # --- Save results to the database ---
         print("Saving allocation results to the database...")
-        results_df = pd.DataFrame(results)
-        
-        # Connect to the database
-        OPTIMIZER_DIR = os.path.dirname(os.path.abspath(__file__))
-        PROJECT_ROOT = os.path.dirname(os.path.dirname(OPTIMIZER_DIR))
-        DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-        engine = create_engine(f"sqlite:///{DB_PATH}")
+        engine = get_engine()
 
         # Clear old results for this scenario and save new ones
         with engine.begin() as conn:
-            conn.execute(text(f"DELETE FROM Allocation WHERE scenario_id = {TEST_SCENARIO_ID}"))
-            results_df.to_sql('Allocation', conn, if_exists='append', index=False)
+            replace_allocation(conn, TEST_SCENARIO_ID, results)
         
         print("Successfully saved results.")
 
+# Run from backend/ as a module so the relative and database imports resolve:
+#   python -m optimization.optimizer
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,131 @@
+import numpy as np
+
+
+class SiteClasses:
+    """
+    A partition of the active sites into interchangeable classes.
+
+    Sites in one class have the same capacity, the same priority and hit exactly the
+    same targets with every missile type, so the model only needs one aggregated
+    variable X[c, m] per class. Each class is identified by its first member's site id
+    (the representative), which keeps variable names unchanged for singleton classes.
+    """
+
+    def __init__(self, instance, members):
+        # members: list of arrays of positions into the instance's site arrays
+        self.members = [np.asarray(group, dtype=np.int64) for group in members]
+        self.rep_idx = np.array([group[0] for group in self.members], dtype=np.int64)
+        self.rep_ids = instance.site_ids[self.rep_idx].tolist()
+        self.sizes = np.array([len(group) for group in self.members], dtype=np.int64)
+        self.member_ids = {
+            rep: instance.site_ids[group].tolist() for rep, group in zip(self.rep_ids, self.members)
+        }
+
+    @classmethod
+    def singletons(cls, instance, site_idx):
+        """
+        The trivial partition: every site is its own class.
+        """
+        return cls(instance, [[k] for k in site_idx])
+
+    @property
+    def num_sites(self):
+        return int(self.sizes.sum())
+
+    @property
+    def site_ids(self):
+        """
+        All original site ids covered by the classes.
+        """
+        return [i for rep in self.rep_ids for i in self.member_ids[rep]]
+
+    def disaggregate(self, values):
+        """
+        Splits {(rep_id, type_id): X} class totals into {(site_id, type_id): x} per site.
+
+        Every type's total is split as evenly as possible and the remainders are dealt
+        round-robin across types, so per-site totals differ by at most one. That keeps each
+        site within its capacity and at or above one missile whenever the class totals are,
+        and, since the defense term is concave per site, an even split is also optimal.
+        """
+        allocation = {}
+        type_ids = sorted({m_type for _, m_type in values})
+        for rep in self.rep_ids:
+            sites = self.member_ids[rep]
+            n = len(sites)
+            pointer = 0
+            for m_type in type_ids:
+                total = int(round(values.get((rep, m_type), 0)))
+                q, r = divmod(total, n)
+                for offset, i in enumerate(sites):
+                    extra = 1 if (offset - pointer) % n < r else 0
+                    allocation[i, m_type] = q + extra
+                pointer = (pointer + r) % n
+        return allocation
+
+
+def aggregate_equivalent_sites(instance, site_idx, target_idx):
+    """
+    Groups sites with identical capacity, priority and reachability signature.
+
+    target_idx should list every target the model covers (for the robust model, the
+    targets of all scenarios), so two sites only merge if they are interchangeable in
+    every coverage constraint.
+    """
+    reach = instance.reachability(site_idx, target_idx)
+
+    groups = {}
+    for k, pos in enumerate(site_idx):
+        signature = (
+            int(instance.capacity[pos]),
+            float(instance.site_priority[pos]),
+            np.packbits(reach[k]).tobytes()
+        )
+        groups.setdefault(signature, []).append(pos)
+
+    classes = SiteClasses(instance, list(groups.values()))
+    print(f"Site aggregation: {len(site_idx)} sites -> {len(classes.rep_ids)} classes")
+    return classes
+
+
+def aggregated_defense_curve(size, upper):
+    """
+    Breakpoints of sum_i 0.8^{x_i} for a class of `size` sites sharing X = 0..upper missiles evenly.
+
+    With q, r = divmod(X, size), r sites hold q + 1 missiles and the rest hold q, giving
+    (size - r) * 0.8^q + r * 0.8^(q + 1). The curve is exact at every integer X, so a
+    piecewise-linear constraint through these points models the class without error.
+    """
+    xs = np.arange(upper + 1)
+    q, r = np.divmod(xs, size)
+    ys = (size - r) * 0.8 ** q + r * 0.8 ** (q + 1)
+    return xs.astype(float).tolist(), ys.tolist()
+
+
+def collapse_coverage_targets(reach, target_ids, target_priority, type_ids):
+    """
+    Merges targets whose coverage expression N_{t,m} is identical for a missile type.
+
+    For each type, targets hit by exactly the same set of sites share one coverage term,
+    weighted by the sum of their priorities. Targets no site can reach are dropped, since
+    their term (1 - 0.9^0) is always zero. Returns a list of
+    ((rep_target_id, type_id), type_position, hitting_site_positions, weight) entries,
+    where rep_target_id is the first target of the group and names its variables.
+    """
+    coverage = []
+    for n, m_type in enumerate(type_ids):
+        groups = {}
+        for j, t in enumerate(target_ids):
+            hitting = np.flatnonzero(reach[:, j, n])
+            if len(hitting) == 0:
+                continue
+            key = hitting.tobytes()
+            if key in groups:
+                groups[key][3] += float(target_priority[j])
+            else:
+                groups[key] = [(t, m_type), n, hitting, float(target_priority[j])]
+        coverage.extend(tuple(entry) for entry in groups.values())
+
+    merged = len(target_ids) * len(type_ids) - len(coverage)
+    print(f"Target collapsing: {len(target_ids) * len(type_ids)} coverage terms -> {len(coverage)} ({merged} merged or unreachable)")
+    return coverage
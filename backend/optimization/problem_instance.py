@@ -0,0 +1,225 @@
+import hashlib
+import os
+import numpy as np
+from .distances import ChunkedDistances
+
+
+class ProblemInstance:
+    """
+    Immutable, array-backed snapshot of everything the optimization models read.
+
+    Site, missile and target attributes are stored as contiguous NumPy arrays aligned
+    with site_ids / type_ids / target_ids, and the id -> position maps are rebuilt on load.
+    An instance can be written to a directory of raw .npy buffers with save() and
+    attached by any number of worker processes with load(path), which memory-maps the
+    arrays read-only instead of copying them. (.npz archives cannot be memory-mapped,
+    hence one .npy file per array.)
+    """
+
+    # Arrays persisted by save(); everything else is derived from them
+    ARRAY_FIELDS = (
+        'site_ids', 'site_names', 'capacity', 'site_priority',
+        'type_ids', 'missile_names', 'range_km', 'warhead_multiplier', 'accuracy_multiplier', 'total_stock',
+        'target_ids', 'target_names', 'target_priority', 'distances',
+        'scenario_ids', 'scenario_names', 'scenario_target_scenario', 'scenario_target_index'
+    )
+
+    __slots__ = ARRAY_FIELDS + ('site_index', 'type_index', 'target_index', 'scenario_index', 'reach_pairs')
+
+    # Rows of an array hashed at a time by fingerprint(), so memory-mapped matrices are never loaded whole
+    FINGERPRINT_BLOCK_BYTES = 16 * 1024 * 1024
+
+    # Sparse pairs scanned at a time by reachability()
+    REACH_BLOCK_PAIRS = 1 << 20
+
+    def __init__(self, reach_pairs=None, **arrays):
+        missing = set(self.ARRAY_FIELDS) - set(arrays)
+        if missing:
+            raise ValueError(f"ProblemInstance is missing arrays: {sorted(missing)}")
+
+        for field in self.ARRAY_FIELDS:
+            array = arrays[field]
+            if not isinstance(array, np.memmap):
+                array = np.ascontiguousarray(array)
+            if array.flags.writeable:
+                array = array.view()
+                array.flags.writeable = False
+            object.__setattr__(self, field, array)
+
+        object.__setattr__(self, 'site_index', {int(i): k for k, i in enumerate(self.site_ids)})
+        object.__setattr__(self, 'type_index', {int(m): k for k, m in enumerate(self.type_ids)})
+        object.__setattr__(self, 'target_index', {int(t): k for k, t in enumerate(self.target_ids)})
+        object.__setattr__(self, 'scenario_index', {int(s): k for k, s in enumerate(self.scenario_ids)})
+
+        # Optional sparse (site, target) positions and distances of every pair within the
+        # longest range (see ChunkedDistances); reachability() then never reads the matrix
+        object.__setattr__(self, 'reach_pairs', reach_pairs)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ProblemInstance is immutable")
+
+    def __reduce__(self):
+        return (_rebuild_instance, ({field: getattr(self, field) for field in self.ARRAY_FIELDS}, self.reach_pairs))
+
+    # --- Construction ---
+
+    @classmethod
+    def from_frames(cls, sites, missiles, scenarios, targets, scenario_targets, distances):
+        """
+        Builds an instance from the DataFrames returned by get_data().
+        distances may also be the ChunkedDistances of get_data(chunked=True), whose
+        memory-mapped matrix is used as is when it follows the order of sites and targets,
+        together with its sparse pairs for reachability.
+        """
+        target_ids = targets.index.to_numpy(dtype=np.int64)
+        site_ids = sites.index.to_numpy(dtype=np.int64)
+        range_km = missiles['range_km'].to_numpy(dtype=np.float64)
+        reach_pairs = None
+        if isinstance(distances, ChunkedDistances):
+            if np.array_equal(distances.site_ids, site_ids) and np.array_equal(distances.target_ids, target_ids):
+                distance_matrix = distances.matrix
+                # The pairs only describe reachability if they cover the longest range
+                if len(range_km) == 0 or distances.max_range_km >= range_km.max():
+                    reach_pairs = (distances.pair_sites, distances.pair_targets, distances.pair_distances)
+            else:
+                distance_matrix = distances.to_frame().loc[sites.index, targets.index].to_numpy(dtype=np.float64)
+        else:
+            distance_matrix = distances.loc[sites.index, targets.index].to_numpy(dtype=np.float64)
+        target_position = {int(t): k for k, t in enumerate(target_ids)}
+        st_target_index = np.array([target_position[int(t)] for t in scenario_targets['target_id']], dtype=np.int64)
+
+        return cls(
+            reach_pairs=reach_pairs,
+            site_ids=site_ids,
+            site_names=sites['name'].astype(str).to_numpy(dtype=str),
+            capacity=sites['capacity'].to_numpy(dtype=np.int64),
+            site_priority=sites['priority'].to_numpy(dtype=np.float64),
+            type_ids=missiles.index.to_numpy(dtype=np.int64),
+            missile_names=missiles['name'].astype(str).to_numpy(dtype=str),
+            range_km=range_km,
+            warhead_multiplier=missiles['warhead_multiplier'].to_numpy(dtype=np.float64),
+            accuracy_multiplier=missiles['accuracy_multiplier'].to_numpy(dtype=np.float64),
+            total_stock=missiles['total_stock'].to_numpy(dtype=np.int64),
+            target_ids=target_ids,
+            target_names=targets['name'].astype(str).to_numpy(dtype=str),
+            target_priority=targets['priority'].to_numpy(dtype=np.float64),
+            distances=distance_matrix,
+            scenario_ids=scenarios.index.to_numpy(dtype=np.int64),
+            scenario_names=scenarios['name'].astype(str).to_numpy(dtype=str),
+            scenario_target_scenario=scenario_targets['scenario_id'].to_numpy(dtype=np.int64),
+            scenario_target_index=st_target_index
+        )
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """
+        Writes every array as a raw .npy buffer under the directory path and returns it.
+        """
+        os.makedirs(path, exist_ok=True)
+        for field in self.ARRAY_FIELDS:
+            np.save(os.path.join(path, f"{field}.npy"), getattr(self, field), allow_pickle=False)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Attaches to an instance written by save(). With mmap=True the arrays are
+        memory-mapped read-only, so worker processes share the OS page cache.
+        """
+        mmap_mode = 'r' if mmap else None
+        arrays = {
+            field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+            for field in cls.ARRAY_FIELDS
+        }
+        return cls(**arrays)
+
+    def fingerprint(self):
+        """
+        Hex digest of every array's dtype, shape and contents; equal instances share it.
+        Arrays are hashed a block of rows at a time, so a memory-mapped distance matrix
+        is streamed through the hash instead of being copied into memory.
+        """
+        digest = hashlib.sha1()
+        for field in self.ARRAY_FIELDS:
+            array = getattr(self, field)
+            digest.update(f"{field}:{array.dtype.str}:{array.shape};".encode())
+            if array.ndim == 0:
+                digest.update(np.ascontiguousarray(array).tobytes())
+                continue
+            row_bytes = max(1, array[:1].nbytes)
+            rows = max(1, self.FINGERPRINT_BLOCK_BYTES // row_bytes)
+            for start in range(0, len(array), rows):
+                digest.update(np.ascontiguousarray(array[start:start + rows]).tobytes())
+        return digest.hexdigest()
+
+    # --- Queries used by the model builders ---
+
+    @property
+    def num_sites(self):
+        return len(self.site_ids)
+
+    @property
+    def num_types(self):
+        return len(self.type_ids)
+
+    @property
+    def num_targets(self):
+        return len(self.target_ids)
+
+    def has_scenario(self, scenario_id):
+        return int(scenario_id) in self.scenario_index
+
+    def scenario_name(self, scenario_id):
+        return str(self.scenario_names[self.scenario_index[int(scenario_id)]])
+
+    def scenario_target_indices(self, scenario_id):
+        """
+        Positions (into target_ids) of the targets that belong to a scenario.
+        """
+        return self.scenario_target_index[self.scenario_target_scenario == int(scenario_id)]
+
+    def qatar_mask(self):
+        """
+        Boolean mask over sites whose name mentions Qatar.
+        """
+        return np.char.find(np.char.lower(self.site_names.astype(str)), 'qatar') >= 0
+
+    def reachability(self, site_idx, target_idx):
+        """
+        Boolean array [site, target, type]: True where the site can hit the target with that type.
+        With sparse reach_pairs it is filled from the pairs, without reading the distance matrix.
+        """
+        if self.reach_pairs is not None:
+            pair_sites, pair_targets, pair_distances = self.reach_pairs
+            site_position = np.full(self.num_sites, -1, dtype=np.int64)
+            site_position[site_idx] = np.arange(len(site_idx))
+            target_position = np.full(self.num_targets, -1, dtype=np.int64)
+            target_position[target_idx] = np.arange(len(target_idx))
+
+            reach = np.zeros((len(site_idx), len(target_idx), self.num_types), dtype=bool)
+            for start in range(0, len(pair_sites), self.REACH_BLOCK_PAIRS):
+                block = slice(start, start + self.REACH_BLOCK_PAIRS)
+                rows, cols = site_position[pair_sites[block]], target_position[pair_targets[block]]
+                keep = (rows >= 0) & (cols >= 0)
+                reach[rows[keep], cols[keep]] = pair_distances[block][keep][:, None] <= self.range_km[None, :]
+            return reach
+
+        block = self.distances[np.ix_(site_idx, target_idx)]
+        return block[:, :, None] <= self.range_km[None, None, :]
+
+    def effectiveness(self):
+        """
+        Per-type warhead x accuracy multiplier used in both objective terms.
+        """
+        return self.warhead_multiplier * self.accuracy_multiplier
+
+    def site_name(self, site_id):
+        return str(self.site_names[self.site_index[int(site_id)]])
+
+    def missile_name(self, type_id):
+        return str(self.missile_names[self.type_index[int(type_id)]])
+
+
+def _rebuild_instance(arrays, reach_pairs=None):
+    return ProblemInstance(reach_pairs=reach_pairs, **arrays)
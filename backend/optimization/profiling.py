@@ -0,0 +1,98 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles')
+
+
+class PhaseTimer:
+    """
+    Accumulates the wall time spent in each named phase of an optimization run.
+
+    Phases are timed either with the phase(name) context manager or with explicit
+    start(name) / stop(name) calls, and a phase entered several times adds up.
+    as_dict() reports the phases in the order they first ran, plus the total since
+    the timer was created.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._running = {}
+        self._created = time.perf_counter()
+
+    def start(self, name):
+        self._running[name] = time.perf_counter()
+
+    def stop(self, name):
+        started = self._running.pop(name, None)
+        if started is not None:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def as_dict(self):
+        timings = {name: round(seconds, 4) for name, seconds in self.phases.items()}
+        timings["total"] = round(time.perf_counter() - self._created, 4)
+        return timings
+
+
+@contextmanager
+def profile_run(name, enabled=True, directory=DEFAULT_PROFILE_DIR):
+    """
+    Profiles the with-block and writes a report named after the run.
+
+    Uses pyinstrument (an HTML call tree) when it is installed and cProfile otherwise
+    (a text report sorted by cumulative time, next to the raw .prof file).
+    Yields a dict that holds the report's path and profiler once the block exits.
+    Only the calling thread is profiled; time inside Gurobi shows up under optimize().
+    """
+    report = {}
+    if not enabled:
+        yield report
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, name)
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield report
+        finally:
+            profiler.stop()
+            with open(f"{base}.html", 'w') as f:
+                f.write(profiler.output_html())
+            report.update(path=f"{base}.html", profiler="pyinstrument")
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield report
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{base}.prof")
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(60)
+            with open(f"{base}.txt", 'w') as f:
+                f.write(text.getvalue())
+            report.update(path=f"{base}.txt", profiler="cProfile")
+
+    print(f"Profile written to {report['path']}")
@@ -1,9 +1,14 @@
 
-import pandas as pd
 import gurobipy as gp
 from gurobipy import GRB
 import numpy as np
 from .optimizer import get_data
+from .incumbents import make_incumbent_callback, has_usable_solution
+from .problem_instance import ProblemInstance
+from .profiling import PhaseTimer
+from .tuning import apply_tuning_profile
+from .presolve import (SiteClasses, aggregate_equivalent_sites, aggregated_defense_curve,
+                       collapse_coverage_targets)
 
 def get_realistic_probabilities():
     """
@@ -15,63 +20,49 @@ def get_realistic_probabilities():
         3: 0.45   # Israel-US Coalition (Middle East dynamics, higher)
     }
 
-def run_robust_optimization():
+def build_robust_model(instance, classes, probabilities, env=None):
     """
-    Runs probability-weighted robust optimization across all scenarios.
-    Uses realistic probabilities based on conflict analysis.
+    Builds the probability-weighted robust model over the given site classes.
+
+    Returns the model and its allocation variables x, keyed by (representative site_id, type_id).
+    Solver parameters are left to the caller, so the same build can be cached on disk.
     """
-    # Load data
-    sites, missiles, scenarios, targets, scenario_targets, distances = get_data()
-    
-    # SPECIAL CASE: For robust optimization, we need to handle Qatar sites
-    # Qatar should be inactive in scenario 3 (US-Israel Coalition)
-    # For robust optimization, we'll use a subset of sites that works for all scenarios
-    # This means excluding Qatar sites since they're inactive in one scenario
-    original_sites = sites.copy()
-    active_sites = sites[~sites['name'].str.contains('Qatar', case=False, na=False)]
-    print(f"Robust optimization: Qatar sites excluded for cross-scenario compatibility.")
-    print(f"Active sites: {len(active_sites)} (was {len(original_sites)})")
-    
-    # Use active_sites for the rest of the optimization
-    sites = active_sites
-    
-    # Get realistic probabilities
-    probabilities = get_realistic_probabilities()
-    
-    print(f"--- Starting Robust Optimization ---")
-    print(f"Realistic scenario probabilities:")
-    for scenario_id, prob in probabilities.items():
-        scenario_name = scenarios.loc[scenario_id]['name']
-        print(f"  Scenario {scenario_id} ({scenario_name}): {prob:.2f}")
+    class_idx = classes.rep_idx
+    class_size = classes.sizes
+    site_ids = classes.rep_ids
+    type_ids = instance.type_ids.tolist()
 
     # --- Create Gurobi Model ---
-    m = gp.Model("StrategicShield_Robust")
-    m.setParam('OutputFlag', 1)
-    m.setParam('NonConvex', 2)
+    m = gp.Model("StrategicShield_Robust", env=env)
 
     # --- Decision Variables ---
     # x[i,m] = number of missiles of type m at site i (same allocation for all scenarios)
-    x = m.addVars(sites.index, missiles.index, vtype=GRB.INTEGER, name="x")
+    x = m.addVars(site_ids, type_ids, vtype=GRB.INTEGER, name="x")
     
     # Auxiliary variables for each scenario
     scenario_vars = {}
-    for scenario_id in scenarios.index:
+    for scenario_id in instance.scenario_ids.tolist():
         # Get targets for this scenario
-        target_ids = scenario_targets[scenario_targets['scenario_id'] == scenario_id]['target_id']
-        scenario_target_data = targets.loc[target_ids]
+        target_idx = instance.scenario_target_indices(scenario_id)
+        target_ids = instance.target_ids[target_idx].tolist()
+
+        # One coverage term per distinct hitting set and missile type in this scenario
+        reach = instance.reachability(class_idx, target_idx)  # reach[i, t, m]
+        coverage = collapse_coverage_targets(reach, target_ids, instance.target_priority[target_idx], type_ids)
+        coverage_keys = [key for key, _, _, _ in coverage]
         
         # Auxiliary variables for this scenario
-        t_r = m.addVars(scenario_target_data.index, missiles.index, vtype=GRB.CONTINUOUS, 
+        t_r = m.addVars(coverage_keys, vtype=GRB.CONTINUOUS, 
                         lb=-GRB.INFINITY, name=f"t_r_{scenario_id}")
-        y_r = m.addVars(scenario_target_data.index, missiles.index, vtype=GRB.CONTINUOUS, 
+        y_r = m.addVars(coverage_keys, vtype=GRB.CONTINUOUS, 
                         lb=0, name=f"y_r_{scenario_id}")
-        t_d = m.addVars(sites.index, missiles.index, vtype=GRB.CONTINUOUS,
+        t_d = m.addVars(site_ids, type_ids, vtype=GRB.CONTINUOUS,
                         lb=-GRB.INFINITY, name=f"t_d_{scenario_id}")
-        y_d = m.addVars(sites.index, missiles.index, vtype=GRB.CONTINUOUS,
+        y_d = m.addVars(site_ids, type_ids, vtype=GRB.CONTINUOUS,
                         lb=0, name=f"y_d_{scenario_id}")
         
         scenario_vars[scenario_id] = {
-            'targets': scenario_target_data,
+            'coverage': coverage,
             't_r': t_r, 'y_r': y_r, 't_d': t_d, 'y_d': y_d
         }
 
@@ -83,22 +74,25 @@ def run_robust_optimization():
     d = 1.0
     ln_09 = np.log(0.9)
     ln_08 = np.log(0.8)
+    capacity = instance.capacity[class_idx] * class_size  # pooled capacity of each class
+    site_priority = instance.site_priority[class_idx]
+    effectiveness = instance.effectiveness()  # w_m * a_m
 
     # --- Constraints ---
     
     # Site capacity constraint
-    for i in sites.index:
-        m.addConstr(gp.quicksum(x[i, m_type] for m_type in missiles.index) <= sites.loc[i, 'capacity'], 
+    for k, i in enumerate(site_ids):
+        m.addConstr(gp.quicksum(x[i, m_type] for m_type in type_ids) <= int(capacity[k]), 
                    name=f"SiteCapacity_{i}")
 
     # Missile stock constraint
-    for m_type in missiles.index:
-        m.addConstr(gp.quicksum(x[i, m_type] for i in sites.index) <= missiles.loc[m_type, 'total_stock'],
+    for n, m_type in enumerate(type_ids):
+        m.addConstr(gp.quicksum(x[i, m_type] for i in site_ids) <= int(instance.total_stock[n]),
                    name=f"MissileStock_{m_type}")
 
-    # Minimum deployment constraint
-    for i in sites.index:
-        m.addConstr(gp.quicksum(x[i, m_type] for m_type in missiles.index) >= 1,
+    # Minimum deployment constraint (one per member site for classes)
+    for k, i in enumerate(site_ids):
+        m.addConstr(gp.quicksum(x[i, m_type] for m_type in type_ids) >= int(class_size[k]),
                    name=f"MinDeployment_{i}")
 
     print("Added basic constraints.")
@@ -106,58 +100,49 @@ def run_robust_optimization():
     # --- Scenario-specific constraints and objective ---
     total_objective = gp.LinExpr()
     
-    for scenario_id in scenarios.index:
+    for scenario_id in instance.scenario_ids.tolist():
         prob = probabilities[scenario_id]
         vars_data = scenario_vars[scenario_id]
-        scenario_target_data = vars_data['targets']
+        coverage = vars_data['coverage']
         t_r, y_r, t_d, y_d = vars_data['t_r'], vars_data['y_r'], vars_data['t_d'], vars_data['y_d']
         
-        # Coverage constraints for this scenario
-        for t in scenario_target_data.index:
-            for m_type in missiles.index:
-                hitting_sites = [i for i in sites.index 
-                               if distances.loc[i, t] <= missiles.loc[m_type, 'range_km']]
-                
-                if hitting_sites:
-                    N_tm = gp.quicksum(x[i, m_type] for i in hitting_sites)
-                    m.addConstr(t_r[t, m_type] == ln_09 * N_tm, name=f"LogCoverage_{scenario_id}_{t}_{m_type}")
-                else:
-                    m.addConstr(t_r[t, m_type] == 0, name=f"LogCoverage_{scenario_id}_{t}_{m_type}")
+        # Coverage constraints for this scenario (collapsed target groups)
+        for (t, m_type), n, hitting, weight in coverage:
+            N_tm = gp.quicksum(x[site_ids[k], m_type] for k in hitting)
+            m.addConstr(t_r[t, m_type] == ln_09 * N_tm, name=f"LogCoverage_{scenario_id}_{t}_{m_type}")
 
         # Exponential constraints for coverage
-        for t in scenario_target_data.index:
-            for m_type in missiles.index:
-                m.addGenConstrExp(t_r[t, m_type], y_r[t, m_type], name=f"ExpCoverage_{scenario_id}_{t}_{m_type}")
+        for (t, m_type), _, _, _ in coverage:
+            m.addGenConstrExp(t_r[t, m_type], y_r[t, m_type], name=f"ExpCoverage_{scenario_id}_{t}_{m_type}")
 
-        # Defense constraints
-        for i in sites.index:
-            for m_type in missiles.index:
-                m.addConstr(t_d[i, m_type] == ln_08 * x[i, m_type], name=f"LogDefense_{scenario_id}_{i}_{m_type}")
-                m.addGenConstrExp(t_d[i, m_type], y_d[i, m_type], name=f"ExpDefense_{scenario_id}_{i}_{m_type}")
+        # Defense constraints (exact piecewise-linear curve for aggregated classes)
+        for k, i in enumerate(site_ids):
+            for n, m_type in enumerate(type_ids):
+                if class_size[k] == 1:
+                    m.addConstr(t_d[i, m_type] == ln_08 * x[i, m_type], name=f"LogDefense_{scenario_id}_{i}_{m_type}")
+                    m.addGenConstrExp(t_d[i, m_type], y_d[i, m_type], name=f"ExpDefense_{scenario_id}_{i}_{m_type}")
+                else:
+                    upper = int(min(capacity[k], instance.total_stock[n]))
+                    xs, ys = aggregated_defense_curve(int(class_size[k]), upper)
+                    x[i, m_type].UB = upper
+                    m.addGenConstrPWL(x[i, m_type], y_d[i, m_type], xs, ys,
+                                      name=f"PWLDefense_{scenario_id}_{i}_{m_type}")
 
         # Objective for this scenario (weighted by probability)
         scenario_objective = gp.LinExpr()
         
-        # Attack bonus
-        for t in scenario_target_data.index:
-            pi_t = scenario_target_data.loc[t, 'priority']
-            target_coverage = gp.LinExpr()
-            for m_type in missiles.index:
-                w_m = missiles.loc[m_type, 'warhead_multiplier']
-                a_m = missiles.loc[m_type, 'accuracy_multiplier']
-                coverage_term = (1 - y_r[t, m_type]) / (1 - 0.9)
-                target_coverage += w_m * a_m * coverage_term
-            scenario_objective += pi_t * 10 * d * target_coverage
+        # Attack bonus (weight = summed priority of the group's targets)
+        for (t, m_type), n, hitting, weight in coverage:
+            coverage_term = (1 - y_r[t, m_type]) / (1 - 0.9)
+            scenario_objective += weight * 10 * d * float(effectiveness[n]) * coverage_term
 
         # Defense bonus
-        for i in sites.index:
-            delta_i = sites.loc[i, 'priority']
+        for k, i in enumerate(site_ids):
+            delta_i = float(site_priority[k])
             site_defense = gp.LinExpr()
-            for m_type in missiles.index:
-                w_m = missiles.loc[m_type, 'warhead_multiplier']
-                a_m = missiles.loc[m_type, 'accuracy_multiplier']
-                defense_term = (1 - y_d[i, m_type]) / (1 - 0.8)
-                site_defense += w_m * a_m * defense_term
+            for n, m_type in enumerate(type_ids):
+                defense_term = (int(class_size[k]) - y_d[i, m_type]) / (1 - 0.8)
+                site_defense += float(effectiveness[n]) * defense_term
             scenario_objective += delta_i * 20 * d * site_defense
 
         # Add weighted scenario objective to total
@@ -167,70 +152,159 @@ def run_robust_optimization():
     m.setObjective(total_objective, GRB.MAXIMIZE)
     print("Set robust objective function.")
 
-    # --- Solve ---
-    print("Starting robust optimization...")
-    m.optimize()
+    return m, x
+
+
+def run_robust_optimization(on_incumbent=None, stop_event=None, instance=None, env=None, aggregate_sites=True,
+                            model_cache=None, timer=None, solution_pool=None):
+    """
+    Runs probability-weighted robust optimization across all scenarios.
+    Uses realistic probabilities based on conflict analysis.
+
+    A prebuilt ProblemInstance can be passed as instance; otherwise the data is loaded
+    from the database. on_incumbent, stop_event, env and aggregate_sites behave as in
+    run_optimization_for_scenario; sites are only merged if they are interchangeable in
+    every scenario. model_cache reuses a model built earlier from identical inputs, and a
+    stored tuning profile for the model's size class is applied before solving.
+    solution_pool collects the top distinct allocations, as in run_optimization_for_scenario.
+    A PhaseTimer passed as timer records the same phases plus save_results.
+    """
+    timer = timer or PhaseTimer()
+
+    # Load data
+    if instance is None:
+        frames = get_data(timer=timer)
+        with timer.phase("prepare_instance"):
+            instance = ProblemInstance.from_frames(*frames)
+    timer.start("prepare_instance")
+    
+    # SPECIAL CASE: For robust optimization, we need to handle Qatar sites
+    # Qatar should be inactive in scenario 3 (US-Israel Coalition)
+    # For robust optimization, we'll use a subset of sites that works for all scenarios
+    # This means excluding Qatar sites since they're inactive in one scenario
+    site_idx = np.flatnonzero(~instance.qatar_mask())
+    print(f"Robust optimization: Qatar sites excluded for cross-scenario compatibility.")
+    print(f"Active sites: {len(site_idx)} (was {instance.num_sites})")
+    
+    # Presolve: merge sites that are interchangeable across all scenarios into classes
+    all_target_idx = np.unique(np.concatenate([
+        instance.scenario_target_indices(scenario_id) for scenario_id in instance.scenario_ids.tolist()
+    ]))
+    if aggregate_sites:
+        classes = aggregate_equivalent_sites(instance, site_idx, all_target_idx)
+    else:
+        classes = SiteClasses.singletons(instance, site_idx)
+    timer.stop("prepare_instance")
 
-    # --- Process Results ---
-    if m.status == GRB.OPTIMAL:
-        print(f"\n--- Robust Optimal Solution Found ---")
-        print(f"Robust Objective Value: {m.objVal:.2f}")
+    # Use the active sites (one representative per class) for the rest of the optimization
+    type_ids = instance.type_ids.tolist()
+    
+    # Get realistic probabilities
+    probabilities = get_realistic_probabilities()
+    
+    print(f"--- Starting Robust Optimization ---")
+    print(f"Realistic scenario probabilities:")
+    for scenario_id, prob in probabilities.items():
+        scenario_name = instance.scenario_name(scenario_id)
+        print(f"  Scenario {scenario_id} ({scenario_name}): {prob:.2f}")
+
+    # Reload the built model from the on-disk cache when the inputs are unchanged
+    m = x = None
+    if model_cache is not None:
+        with timer.phase("load_cached_model"):
+            cache_key = model_cache.key(instance, "robust", aggregate_sites=aggregate_sites,
+                                        probabilities=sorted(probabilities.items()))
+            cached = model_cache.load(cache_key, env=env)
+        if cached is not None:
+            m, x = cached
+            print(f"Loaded compiled model {cache_key} from the model cache.")
+
+    if m is None:
+        with timer.phase("build_model"):
+            m, x = build_robust_model(instance, classes, probabilities, env=env)
+            if model_cache is not None:
+                model_cache.store(cache_key, m, x)
+
+    # Disposed before the pooled Env is handed back, as in run_optimization_for_scenario
+    try:
+        m.setParam('OutputFlag', 1)
+        m.setParam('NonConvex', 2)
+        apply_tuning_profile(m, "robust")
+        if solution_pool is not None:
+            solution_pool.configure(m)
+
+        # --- Solve ---
+        print("Starting robust optimization...")
+        with timer.phase("optimize"):
+            m.optimize(make_incumbent_callback(x, 0, instance, on_incumbent, stop_event,
+                                               disaggregate=classes.disaggregate))
+
+        # --- Process Results ---
+        if has_usable_solution(m):
+            timer.start("extract_results")
+            if m.status == GRB.OPTIMAL:
+                print(f"\n--- Robust Optimal Solution Found ---")
+            else:
+                print(f"\n--- Robust Incumbent Accepted Early (gap {m.MIPGap:.2%}) ---")
+            print(f"Robust Objective Value: {m.objVal:.2f}")
         
-        result_allocations = []
-        total_missiles = 0
+            result_allocations = []
+            total_missiles = 0
+
+            # Split class totals back into per-site allocations
+            values = classes.disaggregate({key: var.X for key, var in x.items()})
         
-        print("\nRobust Allocation (optimized for all scenarios):")
-        for i in sites.index:
-            site_total = 0
-            site_allocations = []
-            for m_type in missiles.index:
-                if x[i, m_type].X > 0.5:
-                    allocated = int(round(x[i, m_type].X))
-                    alloc = {
-                        "scenario_id": 0,  # Special ID for robust solution
-                        "site_id": i,
-                        "type_id": m_type,
-                        "allocated": allocated
-                    }
-                    result_allocations.append(alloc)
-                    site_allocations.append(f"{allocated}×{missiles.loc[m_type,'name']}")
-                    site_total += allocated
-                    total_missiles += allocated
+            print("\nRobust Allocation (optimized for all scenarios):")
+            for i in classes.site_ids:
+                site_total = 0
+                site_allocations = []
+                for m_type in type_ids:
+                    if values[i, m_type] > 0:
+                        allocated = values[i, m_type]
+                        alloc = {
+                            "scenario_id": 0,  # Special ID for robust solution
+                            "site_id": i,
+                            "type_id": m_type,
+                            "allocated": allocated
+                        }
+                        result_allocations.append(alloc)
+                        site_allocations.append(f"{allocated}×{instance.missile_name(m_type)}")
+                        site_total += allocated
+                        total_missiles += allocated
             
-            if site_allocations:
-                print(f"  {sites.loc[i,'name']}: {', '.join(site_allocations)} (Total: {site_total})")
+                if site_allocations:
+                    print(f"  {instance.site_name(i)}: {', '.join(site_allocations)} (Total: {site_total})")
         
-        print(f"\nTotal robust missiles deployed: {total_missiles}")
-        print("---------------------------\n")
+            print(f"\nTotal robust missiles deployed: {total_missiles}")
+            print("---------------------------\n")
+
+            if solution_pool is not None:
+                solution_pool.collect(m, x, 0, disaggregate=classes.disaggregate)
+                print(f"Solution pool: {len(solution_pool.solutions)} distinct robust allocations")
+            timer.stop("extract_results")
         
-        # Save to database
-        save_robust_results(result_allocations)
+            # Save to database
+            with timer.phase("save_results"):
+                save_robust_results(result_allocations)
         
-        return result_allocations
-    else:
-        print(f"Robust optimization failed. Status: {m.status}")
-        return None
+            return result_allocations
+        else:
+            print(f"Robust optimization failed. Status: {m.status}")
+            return None
+    finally:
+        m.dispose()
 
 def save_robust_results(results):
     """
     Saves robust optimization results to database.
     """
-    import os
-    from sqlalchemy import create_engine, text
-    import pandas as pd
-    
+    from database import get_engine, replace_allocation
+
     print("Saving robust allocation results to the database...")
-    results_df = pd.DataFrame(results)
-    
-    # Connect to the database
-    CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-    PROJECT_ROOT = os.path.dirname(os.path.dirname(CURRENT_DIR))
-    DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
-    engine = create_engine(f"sqlite:///{DB_PATH}")
+    engine = get_engine()
 
     # Clear old robust results and save new ones
     with engine.begin() as conn:
-        conn.execute(text("DELETE FROM Allocation WHERE scenario_id = 0"))
-        results_df.to_sql('Allocation', conn, if_exists='append', index=False)
+        replace_allocation(conn, 0, results)
     
     print("Successfully saved robust results.")
\ No newline at end of file
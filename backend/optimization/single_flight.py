@@ -0,0 +1,185 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers arriving while it
+    is still running block until it finishes and receive the same result, or the same
+    exception. Once the leader returns, the key is released, so a later call runs again
+    and sees fresh data. Safe to use from the worker threads serving sync endpoints.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Runs fn() unless a call with the same key is in flight.
+
+        Returns (result, shared), where shared is True for callers that reused
+        another caller's result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """
+        Keys currently being computed, with the number of callers waiting on each.
+        """
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+
+class StreamFanout:
+    """
+    Relays the events of one streamed solve to every stream coalesced onto it.
+
+    Each subscriber registers its publish function and its stop event. publish() forwards
+    an event to all current subscribers, and a subscriber joining mid-solve first receives
+    the latest incumbent. The fanout also stands in for the solver's stop event: is_set()
+    is true once any subscriber has accepted the incumbent early, and stays true even if
+    that subscriber leaves. finish() hands the solve's result (or exception) to wait().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._latest = None
+        self._stopped = False
+        self._call = _Call()
+
+    def subscribe(self, subscriber_id, publish, stop_event):
+        with self._lock:
+            self._subscribers[subscriber_id] = (publish, stop_event)
+            latest = self._latest
+        if latest is not None:
+            publish(dict(latest))
+
+    def unsubscribe(self, subscriber_id):
+        with self._lock:
+            self._subscribers.pop(subscriber_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            self._latest = event
+            publishers = [publish for publish, _ in self._subscribers.values()]
+        for publish in publishers:
+            publish(dict(event))
+
+    def is_set(self):
+        with self._lock:
+            if not self._stopped:
+                self._stopped = any(stop_event.is_set() for _, stop_event in self._subscribers.values())
+            return self._stopped
+
+    def finish(self, result=None, error=None):
+        self._call.result = result
+        self._call.error = error
+        self._call.done.set()
+
+    def wait(self):
+        """
+        Blocks until the solve finishes and returns its result, or raises its exception.
+        """
+        self._call.done.wait()
+        if self._call.error is not None:
+            raise self._call.error
+        return self._call.result
+
+
+class StreamFlight:
+    """
+    Coalesces concurrent streamed runs that share a key into one solve.
+
+    Works like SingleFlight, but every run also subscribes to the StreamFanout of its key.
+    The first run (the leader) calls fn(fanout) and passes the fanout to the solver as its
+    incumbent sink and stop event. Every run subscribed before the solve finished gets the
+    same result. Runs arriving later start a fresh solve on a fresh fanout, so an early
+    acceptance never carries over into the next solve.
+
+    Keep it separate from the SingleFlight of blocking runs. A streaming user may stop a
+    solve early, and a blocking caller must never receive such a solve's result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fanouts = {}
+
+    def do(self, key, subscriber_id, publish, stop_event, fn):
+        """
+        Runs fn(fanout) unless a streamed run with the same key is in flight.
+
+        Returns (result, shared), where shared is True for runs that joined another
+        run's solve.
+        """
+        with self._lock:
+            fanout = self._fanouts.get(key)
+            leader = fanout is None
+            if leader:
+                fanout = self._fanouts[key] = StreamFanout()
+        # A fanout taken from the registry has not been retired yet, so its result is still to come
+        fanout.subscribe(subscriber_id, publish, stop_event)
+
+        try:
+            if not leader:
+                return fanout.wait(), True
+            try:
+                result = fn(fanout)
+            except BaseException as e:
+                self._retire(key)
+                fanout.finish(error=e)
+                raise
+            self._retire(key)
+            fanout.finish(result)
+            return result, False
+        finally:
+            fanout.unsubscribe(subscriber_id)
+
+    def _retire(self, key):
+        with self._lock:
+            del self._fanouts[key]
+
+    def in_flight(self):
+        """
+        Keys currently being solved, with the number of streams subscribed to each.
+        """
+        with self._lock:
+            fanouts = dict(self._fanouts)
+        return {key: fanout.subscriber_count() for key, fanout in fanouts.items()}
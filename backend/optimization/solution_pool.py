@@ -0,0 +1,55 @@
+from gurobipy import GRB
+from .incumbents import allocations_from_values
+
+
+class SolutionPool:
+    """
+    Collects the top-K distinct allocations of one solve from Gurobi's solution pool.
+
+    configure(model) asks Gurobi to search systematically for the size best solutions
+    (PoolSearchMode=2) within a relative gap of the optimum; collect() then reads every
+    pool solution, splits it back onto the sites, drops duplicates and keeps the best
+    size allocations in solutions, each a dict with rank (1 = best), objective and
+    allocations. A size of 1 leaves the solver settings untouched. stopped_early records
+    whether the solve was interrupted (an incumbent accepted early) rather than finished.
+    """
+
+    def __init__(self, size=5, gap=0.1):
+        self.size = max(1, int(size))
+        self.gap = gap
+        self.solutions = []
+        self.stopped_early = False
+
+    def configure(self, model):
+        if self.size > 1:
+            model.setParam('PoolSearchMode', 2)
+            model.setParam('PoolSolutions', self.size)
+            model.setParam('PoolGap', self.gap)
+
+    def collect(self, model, x, scenario_id, disaggregate=None):
+        """
+        Reads the pool of a solved model whose allocation variables are x.
+
+        disaggregate maps class totals to per-site values, as in make_incumbent_callback.
+        """
+        self.solutions = []
+        self.stopped_early = model.status == GRB.INTERRUPTED
+        seen = set()
+        # Gurobi sorts the pool from best to worst objective
+        for number in range(model.SolCount):
+            model.setParam('SolutionNumber', number)
+            values = {key: int(round(var.Xn)) for key, var in x.items()}
+            if disaggregate is not None:
+                values = disaggregate(values)
+            signature = tuple(sorted((key, value) for key, value in values.items() if value))
+            if signature in seen:
+                continue
+            seen.add(signature)
+            self.solutions.append({
+                "rank": len(self.solutions) + 1,
+                "objective": model.PoolObjVal,
+                "allocations": allocations_from_values(scenario_id, values)
+            })
+            if len(self.solutions) == self.size:
+                break
+        return self.solutions
@@ -0,0 +1,48 @@
+import numpy as np
+from .distances import haversine_distance
+from .problem_instance import ProblemInstance
+
+
+def synthetic_instance(num_sites, num_targets, num_types=14, num_scenarios=3, seed=0):
+    """
+    Generates a random ProblemInstance shaped like the shipped catalog.
+
+    Sites are spread over Turkey and targets over the surrounding region, missile
+    ranges run from tens of kilometers to over a thousand, and the targets are split
+    evenly across the scenarios. Used to tune solver parameters for catalog sizes
+    that do not exist yet. The same seed always yields the same instance.
+    """
+    rng = np.random.default_rng(seed)
+
+    site_lat = rng.uniform(36.0, 42.0, num_sites)
+    site_lon = rng.uniform(26.0, 45.0, num_sites)
+    target_lat = rng.uniform(30.0, 45.0, num_targets)
+    target_lon = rng.uniform(20.0, 52.0, num_targets)
+    distances = haversine_distance(site_lat[:, None], site_lon[:, None], target_lat[None, :], target_lon[None, :])
+
+    # Every target belongs to exactly one scenario, as in the shipped ScenarioTarget sheet
+    scenario_ids = np.arange(1, num_scenarios + 1, dtype=np.int64)
+    target_order = rng.permutation(num_targets)
+    scenario_target_scenario = np.empty(num_targets, dtype=np.int64)
+    scenario_target_scenario[target_order] = scenario_ids[np.arange(num_targets) % num_scenarios]
+
+    return ProblemInstance(
+        site_ids=np.arange(1, num_sites + 1, dtype=np.int64),
+        site_names=np.array([f"Synthetic site {i}" for i in range(1, num_sites + 1)]),
+        capacity=rng.integers(5, 101, num_sites),
+        site_priority=rng.integers(1, 101, num_sites).astype(np.float64),
+        type_ids=np.arange(1, num_types + 1, dtype=np.int64),
+        missile_names=np.array([f"Synthetic type {m}" for m in range(1, num_types + 1)]),
+        range_km=np.round(np.exp(rng.uniform(np.log(30.0), np.log(1500.0), num_types))),
+        warhead_multiplier=np.round(rng.uniform(0.8, 35.0, num_types), 2),
+        accuracy_multiplier=np.round(rng.uniform(1.0, 4.0, num_types), 1),
+        total_stock=rng.integers(5, 51, num_types),
+        target_ids=np.arange(1, num_targets + 1, dtype=np.int64),
+        target_names=np.array([f"Synthetic target {t}" for t in range(1, num_targets + 1)]),
+        target_priority=rng.integers(1, 101, num_targets).astype(np.float64),
+        distances=distances,
+        scenario_ids=scenario_ids,
+        scenario_names=np.array([f"Synthetic scenario {s}" for s in scenario_ids]),
+        scenario_target_scenario=scenario_target_scenario,
+        scenario_target_index=np.arange(num_targets, dtype=np.int64)
+    )
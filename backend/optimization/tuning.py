@@ -0,0 +1,95 @@
+import os
+import tempfile
+
+DEFAULT_TUNING_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tuning_profiles')
+TUNING_DIR_ENV = "STRATEGIC_SHIELD_TUNING_DIR"
+
+# Size classes by number of model variables; the last class has no upper bound
+SIZE_CLASSES = (("small", 2000), ("medium", 20000), ("large", None))
+
+# Parameters that describe the tuning run or the caller's logging, not the solver strategy
+EXCLUDED_PARAMS = ("OutputFlag", "LogToConsole", "LogFile", "TimeLimit", "SolutionLimit")
+
+
+def tuning_directory():
+    """
+    Directory holding the .prm profiles: STRATEGIC_SHIELD_TUNING_DIR, or backend/tuning_profiles.
+    """
+    return os.environ.get(TUNING_DIR_ENV) or DEFAULT_TUNING_DIR
+
+
+def size_class(model):
+    """
+    Name of the size class of a built model, e.g. "small".
+    """
+    model.update()
+    num_vars = model.NumVars
+    for name, limit in SIZE_CLASSES:
+        if limit is None or num_vars < limit:
+            return name
+
+
+def profile_path(mode, size, directory=None):
+    """
+    Path of the profile for a model mode ("scenario" or "robust") and size class.
+    """
+    return os.path.join(directory or tuning_directory(), f"{mode}_{size}.prm")
+
+
+def tune_model(model, mode, time_limit=600, trials=3, directory=None):
+    """
+    Runs Gurobi's tuning tool on a built model and stores the best parameter set
+    as the profile of its mode and size class.
+
+    time_limit bounds the whole tuning run in seconds and trials is the number of
+    solves per candidate setting. Returns the profile path, or None if tuning found
+    no parameter set.
+    """
+    path = profile_path(mode, size_class(model), directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    model.setParam('NonConvex', 2)
+    model.setParam('TuneTimeLimit', time_limit)
+    model.setParam('TuneTrials', trials)
+    print(f"Tuning {mode} model ({model.NumVars} variables, class {size_class(model)}) for up to {time_limit}s...")
+    model.tune()
+
+    if model.TuneResultCount == 0:
+        print("Tuning found no parameter set.")
+        return None
+
+    # Results are ordered by improvement (0 is the baseline), so the last one is the best.
+    # Load it into the model, then keep only the solver strategy settings
+    model.getTuneResult(model.TuneResultCount - 1)
+    fd, raw_path = tempfile.mkstemp(suffix='.prm')
+    os.close(fd)
+    try:
+        model.write(raw_path)
+        with open(raw_path) as f:
+            lines = [line for line in f
+                     if not line.split() or line.startswith('#')
+                     or not (line.split()[0].startswith('Tune') or line.split()[0] in EXCLUDED_PARAMS)]
+    finally:
+        os.remove(raw_path)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+    print(f"Stored tuning profile {path}")
+    return path
+
+
+def apply_tuning_profile(model, mode, directory=None):
+    """
+    Applies the stored profile matching the model's mode and size class, if there is one.
+
+    Call it after the caller's own parameters (OutputFlag, NonConvex) are set; the
+    profile never contains logging or time limits. Returns the applied path or None.
+    """
+    path = profile_path(mode, size_class(model), directory)
+    if not os.path.exists(path):
+        return None
+    model.read(path)
+    print(f"Applied tuning profile {os.path.basename(path)}")
+    return path
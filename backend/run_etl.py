@@ -1,5 +1,6 @@
 import sqlite3
 import os
+from database import SQLITE_PATH, get_database_url, get_engine
 from etl.load_from_excel import main as run_etl_main
 
 # --- Paths ---
@@ -7,22 +8,29 @@ from etl.load_from_excel import main as run_etl_main
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 # The project root, which is one level above the 'backend' folder
 PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
-# The final database path
-DB_PATH = os.path.join(PROJECT_ROOT, 'strategic_shield.db')
+# The final database path (used when STRATEGIC_SHIELD_DATABASE_URL is not set)
+DB_PATH = SQLITE_PATH
 # The schema file path
 SCHEMA_PATH = os.path.join(PROJECT_ROOT, 'db', 'schema.sql')
 
 def initialize_database():
     """
     Initializes the database by deleting the old DB file and creating a new one from the schema.
+    For a PostgreSQL URL, the schema script drops and recreates the tables instead.
     """
-    print(f"Initializing database at {DB_PATH}...")
+    database_url = get_database_url()
+    if not database_url.startswith("sqlite"):
+        initialize_server_database(database_url)
+        return
+
+    db_path = database_url[len("sqlite:///"):] or DB_PATH
+    print(f"Initializing database at {db_path}...")
     
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
+    if os.path.exists(db_path):
+        os.remove(db_path)
         print("Removed old database file.")
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     try:
@@ -38,6 +46,24 @@ def initialize_database():
         conn.commit()
         conn.close()
 
+def initialize_server_database(database_url):
+    """
+    Runs the schema script against a database server in one transaction.
+    """
+    engine = get_engine(database_url)
+    print(f"Initializing database at {engine.url.render_as_string(hide_password=True)}...")
+
+    try:
+        with open(SCHEMA_PATH, 'r') as f:
+            schema_sql = f.read()
+    except FileNotFoundError:
+        print(f"ERROR: Could not find the schema file at {SCHEMA_PATH}")
+        raise
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(schema_sql)
+    print("Database schema created successfully.")
+
 def main():
     """
     Main function to orchestrate the ETL process.
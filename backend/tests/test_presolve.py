@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from optimization.presolve import SiteClasses, aggregate_equivalent_sites, collapse_coverage_targets
+from optimization.problem_instance import ProblemInstance
+from optimization.synthetic import synthetic_instance
+
+
+def duplicated_instance(site_copies, seed=0):
+    """
+    A small single-scenario synthetic instance in which site k appears site_copies[k] times.
+
+    Copies share coordinates, capacity and priority, so aggregation merges them. The
+    missile ranges span short to regional, so some targets share hitting sets and
+    others are out of range. Kept small enough for a size-limited Gurobi license.
+    """
+    base = synthetic_instance(len(site_copies), 6, num_types=3, num_scenarios=1, seed=seed)
+    rows = np.repeat(np.arange(base.num_sites), site_copies)
+    arrays = {field: getattr(base, field) for field in ProblemInstance.ARRAY_FIELDS}
+    arrays.update(
+        site_ids=np.arange(1, len(rows) + 1, dtype=np.int64),
+        site_names=np.array([f"Synthetic site {i}" for i in range(1, len(rows) + 1)]),
+        capacity=base.capacity[rows],
+        site_priority=base.site_priority[rows],
+        distances=base.distances[rows],
+        range_km=np.array([300.0, 800.0, 2500.0]),
+        total_stock=np.array([12, 9, 6], dtype=np.int64)
+    )
+    return ProblemInstance(**arrays)
+
+
+def test_disaggregate_respects_capacity_and_minimum():
+    instance = duplicated_instance([3, 2, 1, 4])
+    classes = SiteClasses(instance, [[0, 1, 2], [3, 4], [5], [6, 7, 8, 9]])
+    type_ids = instance.type_ids.tolist()
+    capacity = dict(zip(instance.site_ids.tolist(), instance.capacity.tolist()))
+
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        values = {}
+        for rep, size in zip(classes.rep_ids, classes.sizes.tolist()):
+            # A class total between one missile per site and the pooled capacity,
+            # spread over the types so that several types leave a remainder
+            total = int(rng.integers(size, size * capacity[rep] + 1))
+            shares = rng.multinomial(total, np.ones(len(type_ids)) / len(type_ids))
+            values.update({(rep, m_type): int(share) for m_type, share in zip(type_ids, shares)})
+
+        allocation = classes.disaggregate(values)
+
+        for rep in classes.rep_ids:
+            members = classes.member_ids[rep]
+            for m_type in type_ids:
+                assert sum(allocation[i, m_type] for i in members) == values[rep, m_type]
+            for i in members:
+                site_total = sum(allocation[i, m_type] for m_type in type_ids)
+                assert 1 <= site_total <= capacity[i]
+
+
+def test_collapse_coverage_targets_keeps_attack_term():
+    rng = np.random.default_rng(2)
+    num_sites, type_ids = 5, [1, 2, 3]
+    # Eight targets drawn from three hitting-set patterns, plus one target nobody reaches
+    patterns = rng.random((num_sites, 3, len(type_ids))) < 0.5
+    unreachable = np.zeros((num_sites, 1, len(type_ids)), dtype=bool)
+    reach = np.concatenate([patterns[:, rng.integers(0, 3, 8)], unreachable], axis=1)
+    target_ids = list(range(101, 110))
+    target_priority = rng.integers(1, 101, len(target_ids)).astype(np.float64)
+
+    coverage = collapse_coverage_targets(reach, target_ids, target_priority, type_ids)
+    assert len(coverage) <= 3 * len(type_ids)
+
+    for _ in range(20):
+        x = rng.integers(0, 6, (num_sites, len(type_ids)))
+        # sum_t pi_t (1 - 0.9^{N_{t,m}}) over every target, versus one weighted term per group
+        N = np.einsum('itn,in->tn', reach, x)
+        expected = (target_priority[:, None] * (1 - 0.9 ** N)).sum()
+        collapsed = sum(weight * (1 - 0.9 ** x[hitting, n].sum()) for _, n, hitting, weight in coverage)
+        assert collapsed == pytest.approx(expected)
+
+
+def test_site_aggregation_keeps_objective():
+    pytest.importorskip("gurobipy")
+    from optimization.optimizer import run_optimization_for_scenario
+    from optimization.solution_pool import SolutionPool
+
+    instance = duplicated_instance([2, 1, 3])
+    site_idx = np.arange(instance.num_sites)
+    classes = aggregate_equivalent_sites(instance, site_idx, instance.scenario_target_indices(1))
+    assert len(classes.rep_ids) == 3
+
+    objectives = {}
+    for aggregate_sites in (True, False):
+        pool = SolutionPool(1)
+        allocations = run_optimization_for_scenario(1, instance=instance, aggregate_sites=aggregate_sites,
+                                                    solution_pool=pool)
+        assert {a["site_id"] for a in allocations} == set(instance.site_ids.tolist())
+        objectives[aggregate_sites] = pool.solutions[0]["objective"]
+
+    assert objectives[True] == pytest.approx(objectives[False], rel=1e-3)
@@ -0,0 +1,149 @@
+import threading
+import time
+import pytest
+from optimization.single_flight import SingleFlight, StreamFlight
+
+KEY = (1, "fingerprint", 1, 0.1)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def in_thread(fn, *args):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = fn(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def fake_solve(release, events):
+    """
+    A solve that publishes one incumbent, then runs until released or stopped by its fanout.
+    Returns whether it was stopped early, like SolutionPool.stopped_early.
+    """
+    def solve(fanout=None):
+        if fanout is not None:
+            fanout.publish({"objective": 1.0})
+        while not release.wait(0.01):
+            if fanout is not None and fanout.is_set():
+                break
+        events.append("solved")
+        return fanout is not None and fanout.is_set()
+    return solve
+
+
+def subscriber():
+    received = []
+    return received, received.append, threading.Event()
+
+
+def test_single_flight_shares_result_and_error():
+    flight = SingleFlight()
+    release, events = threading.Event(), []
+    leader, leader_outcome = in_thread(flight.do, KEY, fake_solve(release, events))
+    wait_until(lambda: KEY in flight.in_flight())
+    follower, follower_outcome = in_thread(flight.do, KEY, lambda: "not run")
+    wait_until(lambda: flight.in_flight()[KEY] == 1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert events == ["solved"]
+    assert leader_outcome["result"] == (False, False)
+    assert follower_outcome["result"] == (False, True)
+    assert flight.in_flight() == {}
+
+    def fail():
+        raise ValueError("infeasible")
+
+    with pytest.raises(ValueError):
+        flight.do(KEY, fail)
+    assert flight.in_flight() == {}
+
+
+def test_streams_share_incumbents_and_early_acceptance():
+    flight = StreamFlight()
+    release, events = threading.Event(), []
+    first, publish_first, stop_first = subscriber()
+    second, publish_second, stop_second = subscriber()
+
+    leader, leader_outcome = in_thread(flight.do, KEY, "first", publish_first, stop_first,
+                                       fake_solve(release, events))
+    wait_until(lambda: first)
+    follower, follower_outcome = in_thread(flight.do, KEY, "second", publish_second, stop_second,
+                                           lambda fanout: "not run")
+    wait_until(lambda: flight.in_flight() == {KEY: 2})
+
+    # The joining stream is replayed the latest incumbent, and its accept stops the shared solve
+    assert second == [{"objective": 1.0}]
+    stop_second.set()
+    leader.join()
+    follower.join()
+
+    assert events == ["solved"]
+    assert leader_outcome["result"] == (True, False)
+    assert follower_outcome["result"] == (True, True)
+    assert flight.in_flight() == {}
+
+    # The next identical run starts a fresh solve, not one that is already stopped
+    release.set()
+    third, publish_third, stop_third = subscriber()
+    assert flight.do(KEY, "third", publish_third, stop_third, fake_solve(release, events)) == (False, False)
+    assert third == [{"objective": 1.0}]
+
+
+def test_stream_accept_never_stops_blocking_run():
+    runs, streams = SingleFlight(), StreamFlight()
+    blocking_release, stream_release, events = threading.Event(), threading.Event(), []
+
+    blocking, blocking_outcome = in_thread(runs.do, KEY, fake_solve(blocking_release, events))
+    wait_until(lambda: KEY in runs.in_flight())
+    received, publish, stop_event = subscriber()
+    stream, stream_outcome = in_thread(streams.do, KEY, "stream", publish, stop_event,
+                                       fake_solve(stream_release, events))
+
+    # The stream runs its own solve and gets its incumbents, its accept stops only that solve
+    wait_until(lambda: received)
+    stop_event.set()
+    stream.join()
+    assert stream_outcome["result"] == (True, False)
+    assert blocking.is_alive()
+
+    blocking_release.set()
+    blocking.join()
+    assert blocking_outcome["result"] == (False, False)
+    assert events == ["solved", "solved"]
+
+
+def test_blocking_run_never_joins_streamed_solve():
+    runs, streams = SingleFlight(), StreamFlight()
+    stream_release, blocking_release, events = threading.Event(), threading.Event(), []
+    received, publish, stop_event = subscriber()
+
+    stream, stream_outcome = in_thread(streams.do, KEY, "stream", publish, stop_event,
+                                       fake_solve(stream_release, events))
+    wait_until(lambda: received)
+    blocking, blocking_outcome = in_thread(runs.do, KEY, fake_solve(blocking_release, events))
+    wait_until(lambda: KEY in runs.in_flight())
+
+    # Accepting the streamed incumbent leaves the blocking run solving to the end
+    stop_event.set()
+    stream.join()
+    assert stream_outcome["result"] == (True, False)
+    assert blocking.is_alive()
+
+    blocking_release.set()
+    blocking.join()
+    assert blocking_outcome["result"] == (False, False)
+    assert streams.in_flight() == {} and runs.in_flight() == {}
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+tune_params.py
+
+Offline tuning of Gurobi parameters for the Strategic Shield models.
+
+Builds the scenario or robust model for representative instances (the database
+catalog and/or synthetic catalogs of the given sizes), groups the models by size
+class and runs Gurobi's tuning tool on the largest model of each class. The best
+parameter set is stored as tuning_profiles/<mode>_<class>.prm, which both
+optimizers apply automatically at solve time (see optimization/tuning.py).
+
+Example:
+    python tune_params.py --mode scenario --from-db --synthetic 200x150 --time-limit 900
+"""
+
+import argparse
+import numpy as np
+from optimization.lns import active_site_indices
+from optimization.optimizer import build_scenario_model, get_data
+from optimization.presolve import aggregate_equivalent_sites
+from optimization.problem_instance import ProblemInstance
+from optimization.robust_optimizer import build_robust_model, get_realistic_probabilities
+from optimization.synthetic import synthetic_instance
+from optimization.tuning import size_class, tune_model, tuning_directory
+
+
+def build_model(instance, mode, scenario_id):
+    """
+    Builds the model a solve would build for the instance, with site aggregation.
+    """
+    if mode == "robust":
+        site_idx = active_site_indices(instance, 0)
+        target_idx = np.unique(np.concatenate([
+            instance.scenario_target_indices(s) for s in instance.scenario_ids.tolist()
+        ]))
+        classes = aggregate_equivalent_sites(instance, site_idx, target_idx)
+        m, _ = build_robust_model(instance, classes, get_realistic_probabilities())
+    else:
+        site_idx = active_site_indices(instance, scenario_id)
+        target_idx = instance.scenario_target_indices(scenario_id)
+        classes = aggregate_equivalent_sites(instance, site_idx, target_idx)
+        m, _ = build_scenario_model(instance, scenario_id, classes, target_idx)
+    return m
+
+
+def parse_size(value):
+    sites, targets = value.lower().split("x")
+    return int(sites), int(targets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune Gurobi parameters per model mode and size class.")
+    parser.add_argument("--mode", choices=["scenario", "robust"], default="scenario", help="Model to tune.")
+    parser.add_argument("--scenario", type=int, default=1, help="Scenario to build in --mode scenario.")
+    parser.add_argument("--from-db", action="store_true", help="Tune on the catalog in the database.")
+    parser.add_argument("--synthetic", action="append", type=parse_size, default=[], metavar="SITESxTARGETS",
+                        help="Tune on a synthetic catalog of this size; may be repeated.")
+    parser.add_argument("--types", type=int, default=14, help="Missile types in synthetic catalogs.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic catalogs.")
+    parser.add_argument("--time-limit", type=float, default=600.0, help="Seconds per tuning run (TuneTimeLimit).")
+    parser.add_argument("--trials", type=int, default=3, help="Solves per candidate setting (TuneTrials).")
+    parser.add_argument("--directory", default=tuning_directory(), help="Where the .prm profiles are stored.")
+    args = parser.parse_args()
+
+    instances = []
+    if args.from_db:
+        instances.append(("database", ProblemInstance.from_frames(*get_data())))
+    for num_sites, num_targets in args.synthetic:
+        instances.append((f"synthetic {num_sites}x{num_targets}",
+                          synthetic_instance(num_sites, num_targets, num_types=args.types, seed=args.seed)))
+    if not instances:
+        parser.error("nothing to tune on: pass --from-db and/or --synthetic SITESxTARGETS")
+
+    # Keep the largest model of each size class as its representative
+    representatives = {}
+    for name, instance in instances:
+        m = build_model(instance, args.mode, args.scenario)
+        m.setParam('OutputFlag', 0)
+        m.update()
+        size = size_class(m)
+        print(f"{name}: {m.NumVars} variables, size class {size}")
+        current = representatives.get(size)
+        if current is None or m.NumVars > current[1].NumVars:
+            if current is not None:
+                current[1].dispose()
+            representatives[size] = (name, m)
+        else:
+            m.dispose()
+
+    for size, (name, m) in representatives.items():
+        print(f"--- Tuning {args.mode} / {size} on {name} ---")
+        m.setParam('OutputFlag', 1)
+        tune_model(m, args.mode, time_limit=args.time_limit, trials=args.trials, directory=args.directory)
+        m.dispose()
+
+
+if __name__ == "__main__":
+    main()
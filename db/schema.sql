@@ -1,4 +1,11 @@
 -- Drop existing tables (order matters)
+DROP TABLE IF EXISTS DataVersion;
+DROP TABLE IF EXISTS AllocationTypeSummary;
+DROP TABLE IF EXISTS AllocationSiteSummary;
+DROP TABLE IF EXISTS AllocationScenarioSummary;
+DROP TABLE IF EXISTS RunSolutionAllocation;
+DROP TABLE IF EXISTS RunSolution;
+DROP TABLE IF EXISTS OptimizationRun;
 DROP TABLE IF EXISTS Allocation;
 DROP TABLE IF EXISTS MissileInventory;
 DROP TABLE IF EXISTS ScenarioTarget;
@@ -56,10 +63,82 @@ CREATE TABLE MissileInventory (
 );
 
 -- Allocation results
+-- scenario_id 0 holds the robust allocation, which has no Scenario row
 CREATE TABLE Allocation (
     run_id      SERIAL PRIMARY KEY,
-    scenario_id INTEGER REFERENCES Scenario(scenario_id),
+    scenario_id INTEGER NOT NULL,
     site_id     INTEGER REFERENCES DeploymentSite(site_id),
     type_id     INTEGER REFERENCES MissileType(type_id),
     allocated   INTEGER NOT NULL
 );
+
+-- Writers replace one scenario's rows at a time
+CREATE INDEX idx_allocation_scenario ON Allocation (scenario_id);
+
+-- Rollups of each scenario's allocation, rebuilt in the transaction that writes its Allocation rows.
+-- Utilization is the allocated count over capacity / stock at write time.
+CREATE TABLE AllocationScenarioSummary (
+    scenario_id          INTEGER     PRIMARY KEY,
+    total_missiles       INTEGER     NOT NULL,
+    allocation_count     INTEGER     NOT NULL,
+    sites_used           INTEGER     NOT NULL,
+    types_used           INTEGER     NOT NULL,
+    capacity_utilization REAL,
+    stock_utilization    REAL,
+    updated_at           VARCHAR(32) NOT NULL
+);
+
+CREATE TABLE AllocationSiteSummary (
+    scenario_id          INTEGER NOT NULL,
+    site_id              INTEGER NOT NULL REFERENCES DeploymentSite(site_id),
+    total_allocated      INTEGER NOT NULL,
+    types_used           INTEGER NOT NULL,
+    capacity             INTEGER,
+    capacity_utilization REAL,
+    PRIMARY KEY (scenario_id, site_id)
+);
+
+CREATE TABLE AllocationTypeSummary (
+    scenario_id       INTEGER NOT NULL,
+    type_id           INTEGER NOT NULL REFERENCES MissileType(type_id),
+    total_allocated   INTEGER NOT NULL,
+    sites_used        INTEGER NOT NULL,
+    total_stock       INTEGER,
+    stock_utilization REAL,
+    PRIMARY KEY (scenario_id, type_id)
+);
+
+-- One row per optimization run; timings holds the per-phase wall times as JSON
+CREATE TABLE OptimizationRun (
+    run_key           VARCHAR(32) PRIMARY KEY,
+    scenario_id       INTEGER     NOT NULL,
+    status            VARCHAR(32) NOT NULL,
+    created_at        VARCHAR(32) NOT NULL,
+    allocations_found INTEGER     NOT NULL,
+    timings           TEXT        NOT NULL
+);
+
+-- Alternative allocations from a run's solution pool, rank 1 being the best
+CREATE TABLE RunSolution (
+    run_key   VARCHAR(32) NOT NULL REFERENCES OptimizationRun(run_key),
+    rank      INTEGER     NOT NULL,
+    objective REAL        NOT NULL,
+    PRIMARY KEY (run_key, rank)
+);
+
+CREATE TABLE RunSolutionAllocation (
+    run_key   VARCHAR(32) NOT NULL,
+    rank      INTEGER     NOT NULL,
+    site_id   INTEGER     NOT NULL REFERENCES DeploymentSite(site_id),
+    type_id   INTEGER     NOT NULL REFERENCES MissileType(type_id),
+    allocated INTEGER     NOT NULL,
+    PRIMARY KEY (run_key, rank, site_id, type_id),
+    FOREIGN KEY (run_key, rank) REFERENCES RunSolution(run_key, rank)
+);
+
+-- Token identifying the current catalog and allocation data; its row is written by the
+-- first bump (see bump_data_version in backend/database.py)
+CREATE TABLE DataVersion (
+    id      INTEGER     PRIMARY KEY,
+    version VARCHAR(32) NOT NULL
+);
@@ -1,9 +1,10 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import './App.css';
 import MapView from './components/MapView/MapView';
 import ScenarioSelector from './components/ScenarioSelector/ScenarioSelector';
 import OptimizationPanel from './components/OptimizationPanel/OptimizationPanel';
 import ResultsTable from './components/ResultsTable/ResultsTable';
+import { prefetchScenarioBundles } from './services/api';
 
 export interface AllocationResult {
   site_id: number;
@@ -35,6 +36,11 @@ function App() {
   const [optimizationResults, setOptimizationResults] = useState<AllocationResult[]>([]);
   const [isLoading, setIsLoading] = useState(false);
 
+  // Load every scenario bundle up front so switching scenarios is served from the cache
+  useEffect(() => {
+    prefetchScenarioBundles([1, 2, 3, 'robust']);
+  }, []);
+
   return (
     <div className="app">
       <header className="app-header">
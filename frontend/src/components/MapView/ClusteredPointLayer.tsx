@@ -0,0 +1,190 @@
+import { useEffect } from 'react';
+import { useMap } from 'react-leaflet';
+import L from 'leaflet';
+
+export interface MapPoint {
+  id: string;
+  lat: number;
+  lng: number;
+  color: string;
+  popup: string;
+}
+
+interface PointCluster {
+  lat: number;
+  lng: number;
+  color: string;
+  points: MapPoint[];
+}
+
+interface ClusteredPointLayerProps {
+  points: MapPoint[];
+  // Size of the clustering grid cells in screen pixels
+  clusterRadius?: number;
+  // From this zoom level on every visible point is drawn individually
+  disableClusteringAtZoom?: number;
+  // Small catalogs are always drawn point by point
+  minPointsToCluster?: number;
+}
+
+// Keeps only the points inside the (padded) viewport and merges those that fall into
+// the same clusterRadius-sized pixel cell at the current zoom. Points of different
+// colors never share a cluster, so sites and targets stay distinguishable.
+export const clusterVisiblePoints = (
+  map: L.Map,
+  points: MapPoint[],
+  clusterRadius: number,
+  clustering: boolean
+): PointCluster[] => {
+  const bounds = map.getBounds().pad(0.2);
+  const south = bounds.getSouth();
+  const north = bounds.getNorth();
+  const west = bounds.getWest();
+  const east = bounds.getEast();
+  const zoom = map.getZoom();
+
+  const cells = new Map<string, PointCluster>();
+  const clusters: PointCluster[] = [];
+
+  for (const point of points) {
+    if (point.lat < south || point.lat > north || point.lng < west || point.lng > east) {
+      continue;
+    }
+
+    if (!clustering) {
+      clusters.push({ lat: point.lat, lng: point.lng, color: point.color, points: [point] });
+      continue;
+    }
+
+    const pixel = map.project([point.lat, point.lng], zoom);
+    const key = `${point.color}|${Math.floor(pixel.x / clusterRadius)}|${Math.floor(pixel.y / clusterRadius)}`;
+    const cluster = cells.get(key);
+    if (cluster) {
+      // Running mean keeps the cluster centred on its members
+      const n = cluster.points.length + 1;
+      cluster.lat += (point.lat - cluster.lat) / n;
+      cluster.lng += (point.lng - cluster.lng) / n;
+      cluster.points.push(point);
+    } else {
+      const created = { lat: point.lat, lng: point.lng, color: point.color, points: [point] };
+      cells.set(key, created);
+      clusters.push(created);
+    }
+  }
+
+  return clusters;
+};
+
+// Draws points as circle markers on a shared canvas renderer instead of one DOM
+// marker per point. Only the visible part of the map is drawn, and nearby points
+// are merged into clusters, so the layer stays responsive with tens of thousands of points.
+const ClusteredPointLayer = ({
+  points,
+  clusterRadius = 48,
+  disableClusteringAtZoom = 11,
+  minPointsToCluster = 500
+}: ClusteredPointLayerProps) => {
+  const map = useMap();
+
+  useEffect(() => {
+    const renderer = L.canvas({ padding: 0.2 });
+    const group = L.featureGroup().addTo(map);
+    let frame: number | null = null;
+
+    // Single-point markers are kept across redraws, keyed by point id, so a marker's open
+    // popup survives panning and zooming (Leaflet closes a popup when its layer is removed).
+    // Cluster markers own no popup and are simply rebuilt.
+    let pointMarkers = new Map<string, L.CircleMarker>();
+    let clusterMarkers: L.CircleMarker[] = [];
+
+    const redraw = () => {
+      frame = null;
+      clusterMarkers.forEach(marker => group.removeLayer(marker));
+      clusterMarkers = [];
+
+      const clustering = points.length >= minPointsToCluster && map.getZoom() < disableClusteringAtZoom;
+      const clusters = clusterVisiblePoints(map, points, clusterRadius, clustering);
+      const visibleMarkers = new Map<string, L.CircleMarker>();
+
+      for (const cluster of clusters) {
+        const count = cluster.points.length;
+
+        if (count === 1) {
+          const point = cluster.points[0];
+          let marker = pointMarkers.get(point.id);
+          if (!marker) {
+            marker = L.circleMarker([point.lat, point.lng], {
+              renderer,
+              radius: 8,
+              color: 'white',
+              weight: 2,
+              fillColor: point.color,
+              fillOpacity: 1
+            });
+            marker.bindPopup(point.popup);
+            // A marker kept only for its open popup is dropped once the popup closes
+            marker.on('popupclose', () => scheduleRedraw());
+            group.addLayer(marker);
+          }
+          visibleMarkers.set(point.id, marker);
+          continue;
+        }
+
+        const marker = L.circleMarker([cluster.lat, cluster.lng], {
+          renderer,
+          radius: 10 + Math.min(14, 3 * Math.log2(count)),
+          color: 'white',
+          weight: 2,
+          fillColor: cluster.color,
+          fillOpacity: 0.8
+        });
+        marker.bindTooltip(String(count), {
+          permanent: true,
+          direction: 'center',
+          className: 'cluster-count'
+        });
+        marker.on('click', () => {
+          const bounds = L.latLngBounds(cluster.points.map(p => [p.lat, p.lng] as L.LatLngTuple));
+          map.fitBounds(bounds.pad(0.1));
+        });
+        group.addLayer(marker);
+        clusterMarkers.push(marker);
+      }
+
+      // Drop point markers that were culled or merged into a cluster, unless their popup is open
+      pointMarkers.forEach((marker, id) => {
+        if (visibleMarkers.has(id)) {
+          return;
+        }
+        if (marker.isPopupOpen()) {
+          visibleMarkers.set(id, marker);
+        } else {
+          group.removeLayer(marker);
+        }
+      });
+      pointMarkers = visibleMarkers;
+    };
+
+    // Coalesce bursts of move/zoom events into one redraw per animation frame
+    const scheduleRedraw = () => {
+      if (frame === null) {
+        frame = requestAnimationFrame(redraw);
+      }
+    };
+
+    redraw();
+    map.on('moveend zoomend', scheduleRedraw);
+
+    return () => {
+      map.off('moveend zoomend', scheduleRedraw);
+      if (frame !== null) {
+        cancelAnimationFrame(frame);
+      }
+      group.remove();
+    };
+  }, [map, points, clusterRadius, disableClusteringAtZoom, minPointsToCluster]);
+
+  return null;
+};
+
+export default ClusteredPointLayer;
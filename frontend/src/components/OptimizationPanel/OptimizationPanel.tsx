@@ -1,7 +1,7 @@
-import React from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { ScenarioType, AllocationResult } from '../../App';
 import './OptimizationPanel.css';
-import { runOptimization } from '../../services/api';
+import { acceptIncumbent, getScenarioBundle, IncumbentUpdate, streamOptimization } from '../../services/api';
 
 interface OptimizationPanelProps {
   selectedScenario: ScenarioType;
@@ -16,21 +16,49 @@ const OptimizationPanel: React.FC<OptimizationPanelProps> = ({
   isLoading, 
   setIsLoading 
 }) => {
-  const handleRunOptimization = async () => {
+  const [solveId, setSolveId] = useState<string | null>(null);
+  const [progress, setProgress] = useState<IncumbentUpdate | null>(null);
+  const closeStream = useRef<(() => void) | null>(null);
+
+  // Close any open stream when the panel unmounts
+  useEffect(() => () => closeStream.current?.(), []);
+
+  const finish = () => {
+    closeStream.current = null;
+    setSolveId(null);
+    setIsLoading(false);
+  };
+
+  const handleRunOptimization = () => {
     setIsLoading(true);
-    try {
-      const result = await runOptimization(selectedScenario);
-      if (result) {
-        onOptimizationComplete(result);
-      } else {
+    setProgress(null);
+    onOptimizationComplete([]);
+
+    closeStream.current = streamOptimization(selectedScenario, {
+      onStarted: setSolveId,
+      onIncumbent: (update) => {
+        // Render each improving allocation as soon as the solver finds it
+        setProgress(update);
+        onOptimizationComplete(update.allocations);
+      },
+      onDone: async () => {
+        // The data version moved, so this refetches the scenario's bundle once
+        const bundle = await getScenarioBundle(selectedScenario);
+        onOptimizationComplete(bundle?.allocation ?? []);
+        finish();
+      },
+      onError: (detail) => {
+        console.error("Optimization failed:", detail);
+        alert("Optimization failed. Please check the console for details.");
         onOptimizationComplete([]);
+        finish();
       }
-    } catch (error) {
-      console.error("Optimization failed:", error);
-      alert("Optimization failed. Please check the console for details.");
-      onOptimizationComplete([]);
-    } finally {
-      setIsLoading(false);
+    });
+  };
+
+  const handleAccept = async () => {
+    if (solveId) {
+      await acceptIncumbent(solveId);
     }
   };
 
@@ -47,8 +75,18 @@ const OptimizationPanel: React.FC<OptimizationPanelProps> = ({
           '🚀 Run Optimization'
         )}
       </button>
+      {isLoading && progress && (
+        <div className="solve-progress">
+          <span>Objective: {progress.objective.toFixed(2)}</span>
+          <span>Bound: {progress.bound.toFixed(2)}</span>
+          <span>Gap: {progress.gap === null ? '–' : `${(progress.gap * 100).toFixed(2)}%`}</span>
+          <button className="accept-button" onClick={handleAccept} disabled={!solveId}>
+            ✅ Accept Current Solution
+          </button>
+        </div>
+      )}
     </div>
   );
 };
 
-export default OptimizationPanel; 
\ No newline at end of file
+export default OptimizationPanel; 
@@ -8,7 +8,7 @@ interface ResultsTableProps {
 }
 
 const ResultsTable: React.FC<ResultsTableProps> = ({ results, isLoading }) => {
-  if (isLoading) {
+  if (isLoading && results.length === 0) {
     return (
       <div className="results-table-container">
         <h2>Optimization Results</h2>
@@ -32,6 +32,7 @@ const ResultsTable: React.FC<ResultsTableProps> = ({ results, isLoading }) => {
   return (
     <div className="results-table-container">
       <h2>Optimization Results</h2>
+      {isLoading && <p className="improving-note">Showing the best allocation found so far…</p>}
       <table className="results-table">
         <thead>
           <tr>
@@ -3,15 +3,99 @@ import { ScenarioType, AllocationResult, Site, Target } from '../App';
 
 const API_BASE_URL = '/api';
 
+export interface ScenarioBundle {
+  version: string;
+  scenario: string;
+  sites: Site[];
+  targets: Target[];
+  allocation: AllocationResult[];
+}
+
+// Scenario bundles (or in-flight requests for them) cached for the current data version.
+// epoch is the versionEpoch the request started in, so a response can tell whether a
+// newer version was learned while it was in flight.
+interface CachedBundle {
+  pending: Promise<ScenarioBundle | null>;
+  epoch: number;
+}
+
+const bundleCache = new Map<ScenarioType, CachedBundle>();
+let cachedDataVersion: string | null = null;
+let versionEpoch = 0;
+
+// Records a data version reported by the backend. When it differs from the known one,
+// every cached bundle is dropped, pending requests included, since they may predate it.
+export const noteDataVersion = (version: string) => {
+  if (version === cachedDataVersion) {
+    return;
+  }
+  const firstVersion = cachedDataVersion === null;
+  cachedDataVersion = version;
+  versionEpoch += 1;
+  if (!firstVersion) {
+    bundleCache.clear();
+  }
+};
+
+const fetchScenarioBundle = async (scenario: ScenarioType): Promise<ScenarioBundle | null> => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/scenario-bundle/${scenario}`);
+    return response.data as ScenarioBundle;
+  } catch (error) {
+    console.error(`Error fetching bundle for scenario ${scenario}:`, error);
+    return null;
+  }
+};
+
+// Returns the sites, targets and latest allocation for a scenario,
+// served from the local cache unless the data version has moved on.
+export const getScenarioBundle = async (scenario: ScenarioType): Promise<ScenarioBundle | null> => {
+  let entry = bundleCache.get(scenario);
+  if (!entry) {
+    entry = { pending: fetchScenarioBundle(scenario), epoch: versionEpoch };
+    bundleCache.set(scenario, entry);
+  }
+
+  const bundle = await entry.pending;
+  if (!bundle) {
+    // Failed requests are not cached, so the next call retries
+    if (bundleCache.get(scenario) === entry) {
+      bundleCache.delete(scenario);
+    }
+    return null;
+  }
+
+  if (bundle.version !== cachedDataVersion) {
+    if (entry.epoch !== versionEpoch) {
+      // Started before the current version was learned: never adopt its older version,
+      // fetch the bundle again instead
+      if (bundleCache.get(scenario) === entry) {
+        bundleCache.delete(scenario);
+      }
+      return getScenarioBundle(scenario);
+    }
+    noteDataVersion(bundle.version);
+    // Learned from this response, so the bundle itself stays cached
+    entry.epoch = versionEpoch;
+    bundleCache.set(scenario, entry);
+  }
+  return bundle;
+};
+
+// Warms the cache so later scenario switches need no network round trip
+export const prefetchScenarioBundles = async (scenarios: ScenarioType[]): Promise<void> => {
+  await Promise.all(scenarios.map(getScenarioBundle));
+};
+
 export const runOptimization = async (scenario: ScenarioType): Promise<AllocationResult[] | null> => {
   try {
     const endpoint = scenario === 'robust' ? 'optimization/run/robust' : `optimization/run/${scenario}`;
     const response = await axios.post(`${API_BASE_URL}/${endpoint}`);
     
     if (response.status === 200 && response.data.allocations_found > 0) {
-      // After running, fetch the results
-      const results = await getOptimizationResults(scenario);
-      return results;
+      // The run response already carries the stored allocation and the new data version
+      noteDataVersion(response.data.data_version);
+      return response.data.results as AllocationResult[];
     }
     return [];
   } catch (error) {
@@ -71,4 +155,59 @@ export const getAllTargets = async (): Promise<Target[]> => {
     console.error("Error fetching all targets:", error);
     return [];
   }
-}; 
\ No newline at end of file
+}; 
+export interface IncumbentUpdate {
+  objective: number;
+  bound: number;
+  gap: number | null;
+  elapsed: number;
+  solution_count: number;
+  allocations: AllocationResult[];
+}
+
+export interface StreamHandlers {
+  onStarted?: (solveId: string) => void;
+  onIncumbent: (update: IncumbentUpdate) => void;
+  onDone: (allocationsFound: number, acceptedEarly: boolean) => void;
+  onError: (detail: string) => void;
+}
+
+// Runs an optimization while receiving each improving incumbent via Server-Sent Events.
+// Returns a function that closes the stream.
+export const streamOptimization = (scenario: ScenarioType, handlers: StreamHandlers): (() => void) => {
+  const source = new EventSource(`${API_BASE_URL}/optimization/stream/${scenario}`);
+
+  source.addEventListener('started', (event) => {
+    const data = JSON.parse((event as MessageEvent).data);
+    handlers.onStarted?.(data.solve_id);
+  });
+
+  source.addEventListener('incumbent', (event) => {
+    handlers.onIncumbent(JSON.parse((event as MessageEvent).data) as IncumbentUpdate);
+  });
+
+  source.addEventListener('done', (event) => {
+    const data = JSON.parse((event as MessageEvent).data);
+    source.close();
+    noteDataVersion(data.data_version);
+    handlers.onDone(data.allocations_found, data.accepted_early);
+  });
+
+  source.addEventListener('error', (event) => {
+    // Server-sent 'error' events carry a payload; connection errors do not
+    const message = (event as MessageEvent).data;
+    source.close();
+    handlers.onError(message ? JSON.parse(message).detail : 'Connection to the optimization stream was lost.');
+  });
+
+  return () => source.close();
+};
+
+export const acceptIncumbent = async (solveId: string): Promise<void> => {
+  try {
+    await axios.post(`${API_BASE_URL}/optimization/stream/${solveId}/accept`);
+  } catch (error) {
+    console.error(`Error accepting incumbent for solve ${solveId}:`, error);
+    throw error;
+  }
+};